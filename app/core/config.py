@@ -1,4 +1,4 @@
-from typing import List, Union
+from typing import Dict, List, Union
 from pydantic import AnyHttpUrl, validator
 import os
 from dotenv import load_dotenv
@@ -28,6 +28,68 @@ class Settings(BaseSettings):
     # Gemini API settings
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY", "")
 
+    # Prompt similarity cache settings
+    PROMPT_CACHE_ENABLED: bool = True
+    PROMPT_SIMILARITY_THRESHOLD: float = 0.8
+    # Roughly 2.5 KB of index per entry; generated code is bounded separately by size
+    PROMPT_CACHE_MAX_ENTRIES: int = 100_000
+    GENERATION_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+
+    # Generation deadline settings
+    GENERATION_TIMEOUT_SECONDS: float = 120.0
+    GENERATION_MAX_TIMEOUT_SECONDS: float = 600.0
+
+    # Hedged upstream request settings
+    HEDGING_ENABLED: bool = False
+    HEDGE_PERCENTILE: float = 95.0
+    HEDGE_BUDGET_FRACTION: float = 0.05
+    HEDGE_MAX_BURST: float = 10.0
+    HEDGE_MIN_SAMPLES: int = 20
+    LATENCY_WINDOW_SIZE: int = 500
+
+    # Batch generation settings
+    BATCH_MAX_CONCURRENCY: int = 8
+
+    # Upstream scheduler settings
+    SCHEDULER_MAX_IN_FLIGHT: int = 16
+    SCHEDULER_BATCH_MAX_IN_FLIGHT: int = 12
+    # Fair-queueing weight per account key (e.g. "user:alice", "account:acme"); unlisted accounts get 1.0
+    SCHEDULER_ACCOUNT_WEIGHTS: Dict[str, float] = {}
+    # Only these proxy addresses may name the account with X-Account-ID
+    TRUSTED_PROXIES: List[str] = []
+
+    # Load shedding settings
+    LOAD_SHEDDING_ENABLED: bool = True
+    LOOP_LAG_INTERVAL_SECONDS: float = 0.1
+    LOAD_SHED_LAG_SECONDS: float = 0.5
+    LOAD_SHED_MAX_IN_FLIGHT: int = 200
+    LOAD_SHED_LOW_PRIORITY_LAG_SECONDS: float = 0.1
+    LOAD_SHED_LOW_PRIORITY_MAX_IN_FLIGHT: int = 50
+    LOAD_SHED_RETRY_AFTER_SECONDS: int = 5
+    LOAD_SHED_EXEMPT_PATHS: List[str] = ["/", "/health", "/api/v1/metrics"]
+    LOAD_SHED_LOW_PRIORITY_PATHS: List[str] = ["/api/v1/generate/microservice/batch"]
+
+    # Response compression and result caching settings
+    COMPRESSION_MIN_SIZE: int = 1024
+    COMPRESSION_LEVEL: int = 6
+    RESULT_STORE_MAX_ENTRIES: int = 500
+    # Per-worker cache of results and their compressed variants when workers share state
+    RESULT_STORE_LOCAL_MAX_ENTRIES: int = 100
+
+    # Profiling / debugging settings
+    PROFILING_ENABLED: bool = False
+    DEBUG_TOKEN: str = os.getenv("DEBUG_TOKEN", "")
+    PROFILE_SAMPLE_INTERVAL_SECONDS: float = 0.005
+    PROFILE_MAX_SECONDS: float = 60.0
+
+    # Multi-process serving settings (set by gunicorn.conf.py)
+    WEB_CONCURRENCY: int = 1
+    SHARED_STATE_SOCKET: str = os.getenv("SHARED_STATE_SOCKET", "")
+    SHARED_STATE_AUTHKEY: str = os.getenv("SHARED_STATE_AUTHKEY", "")
+    SHARED_STATE_TIMEOUT_SECONDS: float = 2.0
+    SHARED_STATE_MAX_CONNECTIONS: int = 8
+    METRICS_FLUSH_INTERVAL_SECONDS: float = 1.0
+
     class Config:
         case_sensitive = True
 
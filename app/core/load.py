@@ -0,0 +1,133 @@
+import asyncio
+import time
+from collections import defaultdict
+from typing import Any, Dict, Optional
+
+from fastapi.responses import JSONResponse
+from starlette.routing import Match
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+
+class LoadMonitor:
+    """
+    Tracks event-loop lag and in-flight requests per route.
+
+    Lag is measured by a background task that sleeps for a fixed interval
+    and records how late it wakes up. Spikes register immediately and then
+    decay, so a single slow tick does not shed load for long.
+    """
+
+    def __init__(self, interval: float, decay: float = 0.5):
+        self.interval = interval
+        self.decay = decay
+        self.lag = 0.0
+        self.in_flight = 0
+        self._route_in_flight: Dict[str, int] = defaultdict(int)
+        self._task: Optional[asyncio.Task] = None
+
+    def ensure_started(self) -> None:
+        """Start the lag sampler on the running loop if it is not already running"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._sample_lag())
+
+    async def _sample_lag(self) -> None:
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - start - self.interval)
+            self.lag = max(lag, self.lag * self.decay)
+            metrics.observe("event_loop_lag_seconds", lag)
+
+    def enter(self, route: str) -> None:
+        self.in_flight += 1
+        self._route_in_flight[route] += 1
+
+    def exit(self, route: str) -> None:
+        self.in_flight -= 1
+        self._route_in_flight[route] -= 1
+        if not self._route_in_flight[route]:
+            del self._route_in_flight[route]
+
+    def shed_reason(self, low_priority: bool) -> Optional[str]:
+        """Return why a request should be shed, or None to admit it"""
+        if low_priority:
+            if self.lag >= settings.LOAD_SHED_LOW_PRIORITY_LAG_SECONDS:
+                return "lag"
+            if self.in_flight >= settings.LOAD_SHED_LOW_PRIORITY_MAX_IN_FLIGHT:
+                return "concurrency"
+        if self.lag >= settings.LOAD_SHED_LAG_SECONDS:
+            return "lag"
+        if self.in_flight >= settings.LOAD_SHED_MAX_IN_FLIGHT:
+            return "concurrency"
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        """Current loop lag and in-flight requests per route"""
+        return {
+            "event_loop_lag_seconds": self.lag,
+            "in_flight": self.in_flight,
+            "routes": dict(self._route_in_flight),
+        }
+
+
+class LoadSheddingMiddleware:
+    """
+    ASGI middleware that rejects requests with 503 + Retry-After under overload.
+
+    Low-priority routes are shed first, at lower lag and concurrency
+    thresholds. Health check and metrics paths are always admitted.
+    """
+
+    def __init__(self, app, monitor: Optional[LoadMonitor] = None):
+        self.app = app
+        self.monitor = monitor or load_monitor
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.LOAD_SHEDDING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        self.monitor.ensure_started()
+        path = scope["path"]
+        if path in settings.LOAD_SHED_EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        reason = self.monitor.shed_reason(path in settings.LOAD_SHED_LOW_PRIORITY_PATHS)
+        if reason:
+            metrics.increment(f"requests_shed.{reason}")
+            response = JSONResponse(
+                status_code=503,
+                content={"detail": "Server is overloaded, please retry later"},
+                headers={"Retry-After": str(settings.LOAD_SHED_RETRY_AFTER_SECONDS)}
+            )
+            await response(scope, receive, send)
+            return
+
+        route = _route_template(scope)
+        self.monitor.enter(route)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.monitor.exit(route)
+
+
+def _route_template(scope) -> str:
+    """
+    Key a request by its route template (e.g. /results/{result_id})
+
+    Keying by the raw path would create an entry per distinct URL, so
+    unmatched paths all share one key.
+    """
+    app = scope.get("app")
+    for route in getattr(getattr(app, "router", None), "routes", []):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", "unmatched")
+    return "unmatched"
+
+
+# Global instance
+load_monitor = LoadMonitor(interval=settings.LOOP_LAG_INTERVAL_SECONDS)
@@ -0,0 +1,63 @@
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Tuple
+
+
+class Metrics:
+    """In-process counters and running summaries for operational metrics"""
+
+    def __init__(self):
+        self._counters: Dict[str, int] = defaultdict(int)
+        self._summaries: Dict[str, Dict[str, float]] = {}
+        # Guards against a concurrent drain() from the shared-state flusher thread
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, value: int = 1) -> None:
+        """Add value to a counter"""
+        with self._lock:
+            self._counters[name] += value
+
+    def observe(self, name: str, value: float) -> None:
+        """Record one observation (e.g. a duration in seconds) for a summary"""
+        with self._lock:
+            self._observe(self._summaries, name, {"count": 1, "sum": value, "max": value})
+
+    def drain(self) -> Tuple[Dict[str, int], Dict[str, Dict[str, float]]]:
+        """Return and reset everything recorded since the last drain"""
+        with self._lock:
+            counters, self._counters = dict(self._counters), defaultdict(int)
+            summaries, self._summaries = self._summaries, {}
+        return counters, summaries
+
+    def merge(self, counters: Dict[str, int], summaries: Dict[str, Dict[str, float]]) -> None:
+        """Fold in counters and summaries drained from another Metrics instance"""
+        with self._lock:
+            for name, value in counters.items():
+                self._counters[name] += value
+            for name, summary in summaries.items():
+                self._observe(self._summaries, name, summary)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return a copy of all counters and summaries"""
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "summaries": {
+                    name: {**summary, "avg": summary["sum"] / summary["count"]}
+                    for name, summary in self._summaries.items()
+                },
+            }
+
+    @staticmethod
+    def _observe(summaries: Dict[str, Dict[str, float]], name: str, partial: Dict[str, float]) -> None:
+        summary = summaries.get(name)
+        if summary is None:
+            summaries[name] = dict(partial)
+            return
+        summary["count"] += partial["count"]
+        summary["sum"] += partial["sum"]
+        summary["max"] = max(summary["max"], partial["max"])
+
+
+# Global instance
+metrics = Metrics()
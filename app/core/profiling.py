@@ -0,0 +1,215 @@
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.security import verify_debug_token
+from app.core.shared_state import call_shared, shared_or_local
+
+WALL = "wall"
+CPU = "cpu"
+
+Stack = Tuple[str, ...]
+
+
+def _thread_is_running(native_id: Optional[int]) -> bool:
+    """Whether a thread is currently on CPU, per /proc (Linux); assume yes elsewhere"""
+    if native_id is None:
+        return True
+    try:
+        with open(f"/proc/self/task/{native_id}/stat", "rb") as stat:
+            # State is the first field after the parenthesised command name
+            return stat.read().rsplit(b")", 1)[1].split()[0] == b"R"
+    except (OSError, IndexError):
+        return True
+
+
+class Profile:
+    """Aggregated stack samples from one profiling run"""
+
+    def __init__(self, mode: str, interval: float):
+        self.profile_id = uuid.uuid4().hex
+        # Samples cover only the worker process that took them
+        self.pid = os.getpid()
+        self.mode = mode
+        self.interval = interval
+        self.duration = 0.0
+        self.samples: Counter = Counter()
+
+    def collapsed(self) -> str:
+        """Render in collapsed-stack format (one "frame;frame;frame count" line per stack)"""
+        return "\n".join(f"{';'.join(stack)} {count}" for stack, count in self.samples.most_common())
+
+    def speedscope(self) -> Dict[str, Any]:
+        """Render as a speedscope sampled-profile document"""
+        frames: List[Dict[str, str]] = []
+        frame_index: Dict[str, int] = {}
+        samples, weights = [], []
+        for stack, count in self.samples.items():
+            indices = []
+            for frame in stack:
+                if frame not in frame_index:
+                    frame_index[frame] = len(frames)
+                    frames.append({"name": frame})
+                indices.append(frame_index[frame])
+            samples.append(indices)
+            weights.append(count * self.interval)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": f"MicroWeaver {self.mode} profile",
+            "exporter": "microweaver",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": f"{self.mode} {self.profile_id} (pid {self.pid})",
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            }],
+        }
+
+
+class StackSampler:
+    """
+    Statistical profiler that samples Python stacks from a background thread.
+
+    Wall mode records every sample; CPU mode only records threads the kernel
+    reports as running. Nothing is installed in the profiled threads, so a
+    sampler that is not started costs nothing.
+    """
+
+    def __init__(self, mode: str = WALL, interval: float = 0.005, thread_id: Optional[int] = None):
+        if mode not in (WALL, CPU):
+            raise ValueError(f"Unknown profiling mode: {mode}")
+        self.profile = Profile(mode, interval)
+        self.thread_id = thread_id
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started = 0.0
+
+    def start(self) -> None:
+        self._started = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Profile:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.profile.duration = time.monotonic() - self._started
+        return self.profile
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.profile.interval):
+            native_ids = {t.ident: t.native_id for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or (self.thread_id is not None and thread_id != self.thread_id):
+                    continue
+                if self.profile.mode == CPU and not _thread_is_running(native_ids.get(thread_id)):
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self.profile.samples[tuple(reversed(stack))] += 1
+
+
+class ProfileStore:
+    """Keeps the most recent profiles for later download, shared by all workers"""
+
+    def __init__(self, max_entries: int = 20):
+        self.max_entries = max_entries
+        self._profiles: "OrderedDict[str, Profile]" = OrderedDict()
+
+    def put(self, profile: Profile) -> None:
+        self._profiles[profile.profile_id] = profile
+        while len(self._profiles) > self.max_entries:
+            self._profiles.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        return self._profiles.get(profile_id)
+
+
+class AllocationTracker:
+    """tracemalloc baseline plus diffs against it"""
+
+    def __init__(self):
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+
+    def start(self, frames: int = 1) -> None:
+        """Start tracing (if needed) and take a new baseline snapshot"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        self._baseline = tracemalloc.take_snapshot()
+
+    def diff(self, limit: int = 25) -> List[str]:
+        """Top allocation changes since the baseline, grouped by line"""
+        if self._baseline is None or not tracemalloc.is_tracing():
+            raise ValueError("Allocation tracing is not running")
+        snapshot = tracemalloc.take_snapshot()
+        return [str(stat) for stat in snapshot.compare_to(self._baseline, "lineno")[:limit]]
+
+    def stop(self) -> None:
+        """Stop tracing and drop the baseline"""
+        self._baseline = None
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware for opt-in per-request profiling.
+
+    A request carrying X-Profile and a valid X-Debug-Token is sampled on the
+    event-loop thread for its whole duration (including any other work the
+    loop runs meanwhile). The profile ID is returned in X-Profile-ID. Only
+    added to the app when PROFILING_ENABLED is set.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        mode = headers.get(b"x-profile")
+        if mode is None or not verify_debug_token(headers.get(b"x-debug-token", b"").decode()):
+            await self.app(scope, receive, send)
+            return
+
+        mode = mode.decode().lower()
+        sampler = StackSampler(
+            mode=mode if mode in (WALL, CPU) else WALL,
+            interval=settings.PROFILE_SAMPLE_INTERVAL_SECONDS,
+            thread_id=threading.get_ident()
+        )
+        profile_id = sampler.profile.profile_id
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            await call_shared(profile_store, "put", sampler.stop())
+
+
+# Global instances; profiles are shared so any worker can serve a download,
+# while allocation tracking is inherently per worker process
+profile_store = shared_or_local("profile_store", ProfileStore)
+allocation_tracker = AllocationTracker()
@@ -0,0 +1,209 @@
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from enum import Enum
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+DEFAULT_ACCOUNT = "anonymous"
+
+
+class Priority(str, Enum):
+    INTERACTIVE = "interactive"
+    BATCH = "batch"
+
+
+# Lanes in dispatch order: interactive work is always served first
+_LANES = [Priority.INTERACTIVE, Priority.BATCH]
+
+
+class UpstreamScheduler:
+    """
+    Central admission control for upstream model calls.
+
+    A global in-flight limit matches the provider quota. Interactive calls
+    are always dispatched before batch calls, and batch calls may only hold
+    part of the in-flight capacity, so a batch spike cannot occupy every
+    slot an interactive request would need. Within a lane, accounts share
+    capacity through weighted fair queueing on virtual finish times; an
+    account's share is proportional to its weight in account_weights
+    (1.0 when not listed).
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int,
+        batch_max_in_flight: int,
+        account_weights: Optional[Dict[str, float]] = None
+    ):
+        self.max_in_flight = max_in_flight
+        self.batch_max_in_flight = min(batch_max_in_flight, max_in_flight)
+        if any(weight <= 0 for weight in (account_weights or {}).values()):
+            raise ValueError("Account weights must be positive")
+        self.account_weights = account_weights or {}
+        self._in_flight: Dict[Priority, int] = {lane: 0 for lane in _LANES}
+        self._queues: Dict[Priority, List[Tuple[float, int, asyncio.Future]]] = {lane: [] for lane in _LANES}
+        self._virtual_time: Dict[Priority, float] = {lane: 0.0 for lane in _LANES}
+        self._account_finish: Dict[Priority, Dict[str, float]] = {lane: {} for lane in _LANES}
+        self._sequence = itertools.count()
+
+    @asynccontextmanager
+    async def slot(
+        self, priority: Priority, account: str = DEFAULT_ACCOUNT, weight: Optional[float] = None
+    ) -> AsyncIterator[None]:
+        """Hold one in-flight slot for the duration of the block"""
+        await self.acquire(priority, account, weight)
+        try:
+            yield
+        finally:
+            self.release(priority)
+
+    async def acquire(self, priority: Priority, account: str = DEFAULT_ACCOUNT, weight: Optional[float] = None) -> None:
+        """
+        Wait for an in-flight slot
+
+        Args:
+            priority: Lane the call belongs to
+            account: Key that fair queueing balances between
+            weight: Relative share of the lane for this account; defaults to
+                its entry in account_weights, else 1.0
+        """
+        start = time.monotonic()
+        if self.try_acquire(priority):
+            self._record_dispatch(priority, start)
+            return
+
+        if weight is None:
+            weight = self.account_weights.get(account, 1.0)
+        lane_finish = self._account_finish[priority]
+        finish = max(self._virtual_time[priority], lane_finish.get(account, 0.0)) + 1.0 / weight
+        lane_finish[account] = finish
+        if len(lane_finish) > 4096:
+            self._prune_accounts(priority)
+
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queues[priority], (finish, next(self._sequence), waiter))
+        self._dispatch()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was granted just as we were cancelled; hand it on
+                self.release(priority)
+            else:
+                waiter.cancel()
+            raise
+        self._record_dispatch(priority, start)
+
+    def try_acquire(self, priority: Priority) -> bool:
+        """Take a slot only if one is free and nobody of equal or higher priority is waiting"""
+        for lane in _LANES:
+            self._drop_cancelled(lane)
+            if self._queues[lane]:
+                return False
+            if lane == priority:
+                break
+        if not self._has_capacity(priority):
+            return False
+        self._in_flight[priority] += 1
+        return True
+
+    def release(self, priority: Priority) -> None:
+        """Return a slot and wake the next waiter"""
+        self._in_flight[priority] -= 1
+        self._dispatch()
+
+    def stats(self) -> Dict[str, Any]:
+        """Current in-flight and queued counts per lane"""
+        return {
+            lane.value: {
+                "in_flight": self._in_flight[lane],
+                "queued": sum(1 for _, _, waiter in self._queues[lane] if not waiter.done()),
+            }
+            for lane in _LANES
+        }
+
+    def _has_capacity(self, priority: Priority) -> bool:
+        if sum(self._in_flight.values()) >= self.max_in_flight:
+            return False
+        if priority == Priority.BATCH and self._in_flight[Priority.BATCH] >= self.batch_max_in_flight:
+            return False
+        return True
+
+    def _dispatch(self) -> None:
+        """Grant free slots to queued waiters, highest lane and earliest finish first"""
+        for lane in _LANES:
+            queue = self._queues[lane]
+            while True:
+                self._drop_cancelled(lane)
+                if not queue or not self._has_capacity(lane):
+                    break
+                finish, _, waiter = heapq.heappop(queue)
+                self._virtual_time[lane] = finish
+                self._in_flight[lane] += 1
+                waiter.set_result(None)
+            if queue:
+                # Lower lanes never overtake a waiting higher lane
+                return
+
+    def _drop_cancelled(self, lane: Priority) -> None:
+        queue = self._queues[lane]
+        while queue and queue[0][2].done():
+            heapq.heappop(queue)
+
+    def _prune_accounts(self, lane: Priority) -> None:
+        """Forget accounts whose last request is already behind the virtual clock"""
+        virtual_time = self._virtual_time[lane]
+        lane_finish = self._account_finish[lane]
+        for account in [a for a, finish in lane_finish.items() if finish <= virtual_time]:
+            del lane_finish[account]
+
+    def _record_dispatch(self, priority: Priority, start: float) -> None:
+        metrics.increment(f"scheduler_dispatched.{priority.value}")
+        metrics.observe(f"scheduler_queue_seconds.{priority.value}", time.monotonic() - start)
+
+
+def per_worker_limits(max_in_flight: int, batch_max_in_flight: int, workers: int) -> Tuple[int, int]:
+    """
+    Split the provider quota evenly between worker processes
+
+    A single worker keeps the configured limits unchanged. With several
+    workers, each needs at least one batch slot and at least one slot that
+    batch work cannot take, so the worker count is limited by both caps.
+    The per-worker limits never add up to more than the configured totals.
+
+    Args:
+        max_in_flight: Total in-flight limit across all workers
+        batch_max_in_flight: Total batch in-flight limit across all workers
+        workers: Number of worker processes
+
+    Returns:
+        The (max_in_flight, batch_max_in_flight) limits for one worker
+    """
+    if workers <= 1:
+        return max_in_flight, min(batch_max_in_flight, max_in_flight)
+    if workers > max_in_flight // 2 or workers > batch_max_in_flight:
+        raise ValueError(
+            f"WEB_CONCURRENCY={workers} is too high for SCHEDULER_MAX_IN_FLIGHT={max_in_flight} "
+            f"and SCHEDULER_BATCH_MAX_IN_FLIGHT={batch_max_in_flight}; use at most "
+            f"{max(1, min(max_in_flight // 2, batch_max_in_flight))} workers or raise the limits"
+        )
+    worker_max = max_in_flight // workers
+    return worker_max, min(batch_max_in_flight // workers, worker_max - 1)
+
+
+# Global instance; each worker process gets an equal share of the provider quota
+_worker_max_in_flight, _worker_batch_max_in_flight = per_worker_limits(
+    settings.SCHEDULER_MAX_IN_FLIGHT,
+    settings.SCHEDULER_BATCH_MAX_IN_FLIGHT,
+    settings.WEB_CONCURRENCY
+)
+upstream_scheduler = UpstreamScheduler(
+    max_in_flight=_worker_max_in_flight,
+    batch_max_in_flight=_worker_batch_max_in_flight,
+    account_weights=settings.SCHEDULER_ACCOUNT_WEIGHTS
+)
@@ -1,7 +1,8 @@
+import hmac
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from typing import Optional
-from jose import jwt
+from jose import JWTError, jwt
 from app.core.config import settings
 
 # Password hashing context
@@ -26,4 +27,19 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     
-    return encoded_jwt
\ No newline at end of file
+    return encoded_jwt
+
+def decode_access_token(token: str) -> Optional[str]:
+    """Return the subject of a valid JWT access token, or None if it does not verify."""
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return None
+    subject = payload.get("sub")
+    return str(subject) if subject is not None else None
+
+def verify_debug_token(token: str) -> bool:
+    """Check a token against DEBUG_TOKEN; always fails when no token is configured."""
+    if not settings.DEBUG_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token.encode(), settings.DEBUG_TOKEN.encode())
@@ -0,0 +1,332 @@
+import asyncio
+import functools
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import stat
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Client, Listener, wait
+from typing import Any, Callable, Dict, Optional
+
+from app.core.config import settings
+from app.core.metrics import Metrics, metrics
+
+logger = logging.getLogger(__name__)
+
+# Methods callable on shared objects; private attributes are never exposed
+_ALLOWED_DUNDERS = {"__len__"}
+
+# Failures talking to the server; callers degrade instead of failing the request
+IPC_ERRORS = (OSError, EOFError)
+
+
+def _build_shared_objects() -> Dict[str, Any]:
+    """Create the objects the shared-state server hosts for every worker"""
+    # Imported here because those modules create their globals through shared_or_local()
+    from app.core.profiling import ProfileStore
+    from app.utils.cache import ByteBoundedLRU
+    from app.utils.results import ResultStore
+    from app.utils.similarity import PromptIndex
+
+    return {
+        "prompt_index": PromptIndex(
+            threshold=settings.PROMPT_SIMILARITY_THRESHOLD,
+            max_entries=settings.PROMPT_CACHE_MAX_ENTRIES
+        ),
+        "generation_cache": ByteBoundedLRU(max_bytes=settings.GENERATION_CACHE_MAX_BYTES),
+        "result_store": ResultStore(max_entries=settings.RESULT_STORE_MAX_ENTRIES),
+        "metrics": Metrics(),
+        "profile_store": ProfileStore(),
+    }
+
+
+class SharedStateServer:
+    """
+    Hosts shared objects for all workers behind an authenticated Unix socket.
+
+    Each client connection is served by its own thread. Calls on the same
+    object are serialized by that object's lock, so a slow prompt index
+    lookup does not hold up result store or metrics calls.
+    """
+
+    def __init__(self, address: str, authkey: bytes, objects: Dict[str, Any]):
+        self.address = address
+        self.authkey = authkey
+        self.objects = objects
+        self._locks = {name: threading.Lock() for name in objects}
+
+    def serve_forever(self) -> None:
+        # A server forked by a running gunicorn master inherits its handlers,
+        # which only queue signals for the master; restore the defaults so
+        # the supervisor can stop this process
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGQUIT, signal.SIGHUP, signal.SIGCHLD):
+            signal.signal(signum, signal.SIG_DFL)
+        with Listener(self.address, family="AF_UNIX", authkey=self.authkey) as listener:
+            os.chmod(self.address, 0o600)
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    logger.warning(f"Rejected shared-state connection: {str(e)}")
+                    continue
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn) -> None:
+        with conn:
+            while True:
+                try:
+                    name, method, args, kwargs = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    if method.startswith("_") and method not in _ALLOWED_DUNDERS:
+                        raise AttributeError(f"{method} is not accessible")
+                    with self._locks[name]:
+                        result = getattr(self.objects[name], method)(*args, **kwargs)
+                    conn.send((True, result))
+                except Exception as e:
+                    conn.send((False, e))
+
+
+class SharedStateClient:
+    """
+    Connections to the shared-state server, one per thread and reopened after fork
+
+    Calls block, so async code goes through call_shared(), which runs them
+    on a small thread pool instead of the event loop. A call that gets no
+    reply within the timeout raises TimeoutError and drops its connection.
+    """
+
+    def __init__(self, address: str, authkey: bytes, timeout: float):
+        self.address = address
+        self.authkey = authkey
+        self.timeout = timeout
+        self._local = threading.local()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_pid: Optional[int] = None
+        self._executor_lock = threading.Lock()
+
+    def call(self, name: str, method: str, *args, **kwargs) -> Any:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = Client(self.address, family="AF_UNIX", authkey=self.authkey)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        try:
+            conn.send((name, method, args, kwargs))
+            if not conn.poll(self.timeout):
+                raise TimeoutError(f"No reply from shared-state server for {name}.{method}")
+            ok, result = conn.recv()
+        except IPC_ERRORS:
+            self._local.conn = None
+            conn.close()
+            raise
+        if not ok:
+            raise result
+        return result
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """Thread pool for calls made from async code, recreated after fork"""
+        with self._executor_lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(
+                    max_workers=settings.SHARED_STATE_MAX_CONNECTIONS,
+                    thread_name_prefix="shared-state"
+                )
+                self._executor_pid = os.getpid()
+            return self._executor
+
+
+class SharedProxy:
+    """Forwards method calls on a named shared object to the server"""
+
+    def __init__(self, client: SharedStateClient, name: str):
+        self._client = client
+        self._name = name
+
+    def __getattr__(self, method: str) -> Callable[..., Any]:
+        if method.startswith("_"):
+            raise AttributeError(method)
+        return functools.partial(self._client.call, self._name, method)
+
+    def __len__(self) -> int:
+        return self._client.call(self._name, "__len__")
+
+
+_client: Optional[SharedStateClient] = None
+
+
+def shared_state_enabled() -> bool:
+    return bool(settings.SHARED_STATE_SOCKET)
+
+
+def _get_client() -> SharedStateClient:
+    global _client
+    if _client is None:
+        _client = SharedStateClient(
+            settings.SHARED_STATE_SOCKET,
+            settings.SHARED_STATE_AUTHKEY.encode(),
+            settings.SHARED_STATE_TIMEOUT_SECONDS
+        )
+    return _client
+
+
+def shared_or_local(name: str, factory: Callable[[], Any]) -> Any:
+    """Proxy to the shared object when a shared-state server is configured, else a local instance"""
+    if shared_state_enabled():
+        return SharedProxy(_get_client(), name)
+    return factory()
+
+
+async def call_shared(obj: Any, method: str, *args, default: Any = None, **kwargs) -> Any:
+    """
+    Call a method on an object from shared_or_local() without blocking the event loop
+
+    Shared calls run on the client's thread pool. If the shared-state
+    server cannot be reached the call is logged and returns default, so a
+    server restart looks like a cache miss rather than a failed request.
+    Local objects are called directly.
+
+    Args:
+        obj: The object returned by shared_or_local()
+        method: Name of the method to call
+        default: Value to return when the server cannot be reached
+
+    Returns:
+        The method's return value, or default on IPC failure
+    """
+    if not isinstance(obj, SharedProxy):
+        return getattr(obj, method)(*args, **kwargs)
+
+    client = obj._client
+    call = functools.partial(client.call, obj._name, method, *args, **kwargs)
+    try:
+        return await asyncio.get_running_loop().run_in_executor(client.executor, call)
+    except IPC_ERRORS as e:
+        metrics.increment("shared_state_errors")
+        logger.warning(f"Shared-state call {obj._name}.{method} failed: {str(e)}")
+        return default
+
+
+def _remove_stale_socket(address: str) -> None:
+    """
+    Remove a socket left behind by a server that is no longer running
+
+    Raises:
+        RuntimeError: If the path is not a socket or another server is listening on it
+    """
+    try:
+        mode = os.stat(address).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise RuntimeError(f"{address} exists and is not a socket")
+
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(address)
+    except ConnectionRefusedError:
+        os.unlink(address)
+        return
+    finally:
+        probe.close()
+    raise RuntimeError(f"Another shared-state server is already listening on {address}")
+
+
+def start_server_process() -> multiprocessing.Process:
+    """Start the shared-state server in a child process of the launcher"""
+    _remove_stale_socket(settings.SHARED_STATE_SOCKET)
+    server = SharedStateServer(
+        settings.SHARED_STATE_SOCKET,
+        settings.SHARED_STATE_AUTHKEY.encode(),
+        _build_shared_objects()
+    )
+    process = multiprocessing.get_context("fork").Process(
+        target=server.serve_forever,
+        name="microweaver-shared-state",
+        daemon=True
+    )
+    process.start()
+    return process
+
+
+class SharedStateSupervisor:
+    """
+    Keeps the shared-state server running from the launcher process.
+
+    A background thread watches the server process and starts a fresh one
+    if it has died. Shared state starts empty again after a restart;
+    workers see cache misses until then and reconnect on their next call.
+
+    Death is detected through the process sentinel rather than is_alive():
+    gunicorn's SIGCHLD handler reaps every child of the master, after which
+    is_alive() can no longer tell that the server has exited.
+    """
+
+    def __init__(self, check_interval: float = 1.0):
+        self.check_interval = check_interval
+        self.process: Optional[multiprocessing.Process] = None
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        self.process = start_server_process()
+        threading.Thread(target=self._watch, name="shared-state-supervisor", daemon=True).start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self.process is not None:
+            self.process.terminate()
+            wait([self.process.sentinel], timeout=5)
+        _remove_stale_socket(settings.SHARED_STATE_SOCKET)
+
+    def _watch(self) -> None:
+        while not self._stopped.is_set():
+            if not wait([self.process.sentinel], timeout=self.check_interval) or self._stopped.is_set():
+                continue
+            logger.error(f"Shared-state server (pid {self.process.pid}) exited; restarting")
+            self.process.join(timeout=0)
+            try:
+                self.process = start_server_process()
+            except RuntimeError as e:
+                logger.error(f"Cannot restart shared-state server: {str(e)}")
+                self._stopped.wait(self.check_interval)
+
+
+def flush_metrics() -> None:
+    """Push metrics recorded in this process to the shared aggregate"""
+    counters, summaries = metrics.drain()
+    if counters or summaries:
+        try:
+            _get_client().call("metrics", "merge", counters, summaries)
+        except Exception as e:
+            # Put them back so the next flush retries
+            metrics.merge(counters, summaries)
+            logger.warning(f"Failed to flush metrics: {str(e)}")
+
+
+def start_metrics_flusher() -> None:
+    """Periodically flush this worker's metrics from a background thread"""
+    def run():
+        while True:
+            time.sleep(settings.METRICS_FLUSH_INTERVAL_SECONDS)
+            flush_metrics()
+
+    threading.Thread(target=run, name="metrics-flusher", daemon=True).start()
+
+
+async def metrics_snapshot() -> Dict[str, Any]:
+    """Metrics across all workers when state is shared, else for this process"""
+    if not shared_state_enabled():
+        return metrics.snapshot()
+    client = _get_client()
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(client.executor, flush_metrics)
+    try:
+        return await loop.run_in_executor(client.executor, client.call, "metrics", "snapshot")
+    except IPC_ERRORS as e:
+        logger.warning(f"Falling back to this worker's metrics: {str(e)}")
+        return metrics.snapshot()
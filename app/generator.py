@@ -1,11 +1,20 @@
 import os
+import time
 import asyncio
-from typing import Dict, List, Optional, Any
+from typing import AsyncIterator, Dict, List, Optional, Any, Tuple
 from enum import Enum
 import google.generativeai as genai
 from google.generativeai.types import HarmCategory, HarmBlockThreshold
 import logging
 
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.scheduler import DEFAULT_ACCOUNT, Priority, upstream_scheduler
+from app.core.shared_state import call_shared, shared_or_local
+from app.utils.latency import HedgeBudget, LatencyTracker
+from app.utils.cache import ByteBoundedLRU
+from app.utils.similarity import PromptIndex, prompt_key
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -18,6 +27,9 @@ class MicroserviceComponent(Enum):
     SERVICES = "SERVICES"
     CONFIG = "CONFIG"
 
+class GenerationTimeoutError(Exception):
+    """Raised when a generation runs past its deadline"""
+
 class CodeGenerator:
     def __init__(self):
         """Initialize the Gemini AI code generator"""
@@ -45,13 +57,45 @@ class CodeGenerator:
             }
         )
 
-    async def generate_code(self, prompt: str, context: Optional[Dict[str, Any]] = None) -> str:
+        # Prompt index: identical prompts reuse earlier components, similar ones seed generation.
+        # It only maps prompts to cache keys; the generated files live in a
+        # separate store bounded by total size.
+        self.prompt_index = shared_or_local(
+            "prompt_index",
+            lambda: PromptIndex(
+                threshold=settings.PROMPT_SIMILARITY_THRESHOLD,
+                max_entries=settings.PROMPT_CACHE_MAX_ENTRIES
+            )
+        )
+        self.generation_cache = shared_or_local(
+            "generation_cache",
+            lambda: ByteBoundedLRU(max_bytes=settings.GENERATION_CACHE_MAX_BYTES)
+        )
+
+        # Recent upstream latency per component type, used to time hedged requests
+        self.latency_tracker = LatencyTracker(
+            window_size=settings.LATENCY_WINDOW_SIZE,
+            min_samples=settings.HEDGE_MIN_SAMPLES
+        )
+        self.hedge_budget = HedgeBudget(settings.HEDGE_BUDGET_FRACTION, settings.HEDGE_MAX_BURST)
+
+    async def generate_code(
+        self,
+        prompt: str,
+        context: Optional[Dict[str, Any]] = None,
+        deadline: Optional[float] = None,
+        priority: Priority = Priority.INTERACTIVE,
+        account: str = DEFAULT_ACCOUNT
+    ) -> str:
         """
         Generate code based on the provided prompt and context
         
         Args:
             prompt: The user's request for code generation
             context: Additional context information
+            deadline: time.monotonic() value after which generation is abandoned
+            priority: Scheduling lane for the upstream calls
+            account: Account the upstream calls are fairly queued under
             
         Returns:
             Generated code as a string
@@ -62,11 +106,18 @@ class CodeGenerator:
             full_prompt = self._build_code_prompt(prompt, context)
             
             # Generate code using Gemini
-            response = await self._generate_with_retry(system_prompt + "\n\n" + full_prompt)
+            response = await self._generate_with_retry(
+                system_prompt + "\n\n" + full_prompt,
+                deadline=deadline,
+                priority=priority,
+                account=account
+            )
             
             # Clean and return the generated code
             return self._clean_generated_code(response)
             
+        except GenerationTimeoutError:
+            raise
         except Exception as e:
             logger.error(f"Code generation failed: {str(e)}")
             raise ValueError(f"Failed to generate code: {str(e)}")
@@ -77,7 +128,11 @@ class CodeGenerator:
     async def generate_microservice_code(
         self, 
         prompt: str, 
-        components: Optional[List[MicroserviceComponent]] = None
+        components: Optional[List[MicroserviceComponent]] = None,
+        use_similar_cache: bool = True,
+        deadline: Optional[float] = None,
+        priority: Priority = Priority.INTERACTIVE,
+        account: str = DEFAULT_ACCOUNT
     ) -> Dict[str, str]:
         """
         🎯 CORE METHOD: Generate a complete microservice or specific components
@@ -88,6 +143,10 @@ class CodeGenerator:
         Args:
             prompt: The user's request for microservice generation
             components: List of specific components to generate
+            use_similar_cache: Whether components may be reused from the same prompt or seeded from a similar one
+            deadline: time.monotonic() value after which generation is abandoned
+            priority: Scheduling lane for the upstream calls
+            account: Account the upstream calls are fairly queued under
             
         Returns:
             Dictionary with component names as keys and generated code as values
@@ -97,20 +156,127 @@ class CodeGenerator:
             if not components:
                 components = list(MicroserviceComponent)
             
+            # Components from a previous generation of the same prompt are reused
+            # as-is; a merely similar prompt (which may differ in one technology
+            # or in word order) only seeds the new generation as a reference
+            cached_files = {}
+            reference_files = {}
+            if use_similar_cache and settings.PROMPT_CACHE_ENABLED:
+                match = await call_shared(self.prompt_index, "lookup", prompt, settings.PROMPT_SIMILARITY_THRESHOLD)
+                if match:
+                    files = await call_shared(self.generation_cache, "get", match.value) or {}
+                    if match.exact:
+                        cached_files = files
+                        if files:
+                            logger.info("Reusing generation for identical prompt")
+                    else:
+                        reference_files = files
+                        if files:
+                            metrics.increment("prompt_cache_seeded")
+                            logger.info(f"Seeding generation from similar prompt (similarity {match.similarity:.2f})")
+            
             generated_files = {}
+            pending = sum(1 for c in components if c.value.lower() not in cached_files)
             
-            # Generate each component
+            # Generate each component not already covered by the cache
             for component in components:
-                component_code = await self._generate_component(prompt, component)
-                generated_files[component.value.lower()] = component_code
+                key = component.value.lower()
+                if key in cached_files:
+                    generated_files[key] = cached_files[key]
+                    continue
+                pending -= 1
+                try:
+                    component_code = await self._generate_component(
+                        prompt, component, deadline, priority, account, reference=reference_files.get(key)
+                    )
+                except (asyncio.CancelledError, GenerationTimeoutError):
+                    # Components never started are upstream calls we avoided
+                    metrics.increment("upstream_calls_saved", pending)
+                    raise
+                generated_files[key] = component_code
+            
+            if settings.PROMPT_CACHE_ENABLED:
+                # Keep components stored for this exact prompt by concurrent generations
+                cache_key = prompt_key(prompt)
+                stored_files = await call_shared(self.generation_cache, "get", cache_key) or {}
+                files = {**stored_files, **generated_files}
+                await call_shared(self.generation_cache, "put", cache_key, files, sum(len(code) for code in files.values()))
+                await call_shared(self.prompt_index, "add", prompt, cache_key)
             
             return generated_files
             
+        except GenerationTimeoutError:
+            raise
         except Exception as e:
             logger.error(f"Microservice generation failed: {str(e)}")
             raise ValueError(f"Failed to generate microservice: {str(e)}")
     # ============================================================================
 
+    async def generate_microservice_batch(
+        self,
+        items: List[Tuple[str, Optional[List[MicroserviceComponent]], bool]],
+        deadline: Optional[float] = None,
+        max_concurrency: Optional[int] = None,
+        priority: Priority = Priority.BATCH,
+        account: str = DEFAULT_ACCOUNT
+    ) -> AsyncIterator[Tuple[int, Optional[Dict[str, str]], Optional[Exception]]]:
+        """
+        Generate many microservices under one shared concurrency budget
+        
+        Every item is split into (prompt, component) pairs. Identical pairs
+        across items are generated once, and at most max_concurrency pairs
+        run at a time. Results are yielded per item as soon as all of its
+        components are done.
+        
+        Args:
+            items: (prompt, components, use_similar_cache) tuples
+            deadline: time.monotonic() value after which generation is abandoned
+            max_concurrency: Concurrent component generations, defaults to BATCH_MAX_CONCURRENCY
+            priority: Scheduling lane for the upstream calls
+            account: Account the upstream calls are fairly queued under
+            
+        Yields:
+            (item index, generated files or None, error or None) in completion order
+        """
+        semaphore = asyncio.Semaphore(max_concurrency or settings.BATCH_MAX_CONCURRENCY)
+        component_tasks: Dict[Tuple[str, MicroserviceComponent, bool], asyncio.Future] = {}
+        
+        async def run_component(prompt: str, component: MicroserviceComponent, use_similar_cache: bool) -> str:
+            async with semaphore:
+                files = await self.generate_microservice_code(
+                    prompt, [component], use_similar_cache, deadline, priority, account
+                )
+            return files[component.value.lower()]
+        
+        async def run_item(index: int, prompt: str, components: Optional[List[MicroserviceComponent]], use_similar_cache: bool):
+            tasks = {}
+            for component in components or list(MicroserviceComponent):
+                key = (prompt, component, use_similar_cache)
+                if key in component_tasks:
+                    metrics.increment("batch_components_deduplicated")
+                else:
+                    component_tasks[key] = asyncio.ensure_future(run_component(*key))
+                tasks[component.value.lower()] = component_tasks[key]
+            
+            # asyncio.wait rather than gather so a failure never cancels tasks shared with other items
+            await asyncio.wait(tasks.values())
+            for task in tasks.values():
+                if task.exception() is not None:
+                    return index, None, task.exception()
+            return index, {name: task.result() for name, task in tasks.items()}, None
+        
+        item_tasks = [
+            asyncio.ensure_future(run_item(index, prompt, components, use_similar_cache))
+            for index, (prompt, components, use_similar_cache) in enumerate(items)
+        ]
+        try:
+            for next_item in asyncio.as_completed(item_tasks):
+                yield await next_item
+        finally:
+            for task in [*item_tasks, *component_tasks.values()]:
+                if not task.done():
+                    task.cancel()
+
     def _build_system_prompt(self) -> str:
         """Build the system prompt for code generation"""
         return """You are an expert Python developer specializing in FastAPI microservices.
@@ -140,8 +306,16 @@ Always return only the code without additional explanations or markdown formatti
         
         return base_prompt
 
-    async def _generate_component(self, prompt: str, component: MicroserviceComponent) -> str:
-        """Generate code for a specific microservice component"""
+    async def _generate_component(
+        self,
+        prompt: str,
+        component: MicroserviceComponent,
+        deadline: Optional[float] = None,
+        priority: Priority = Priority.INTERACTIVE,
+        account: str = DEFAULT_ACCOUNT,
+        reference: Optional[str] = None
+    ) -> str:
+        """Generate code for a specific microservice component, optionally adapting a reference implementation"""
         component_prompts = {
             MicroserviceComponent.MAIN: self._get_main_prompt(prompt),
             MicroserviceComponent.ROUTES: self._get_routes_prompt(prompt),
@@ -153,8 +327,20 @@ Always return only the code without additional explanations or markdown formatti
         
         system_prompt = self._build_system_prompt()
         component_prompt = component_prompts[component]
+        if reference:
+            component_prompt += f"""
+
+The following was generated for a similar but not identical request. Use it as a
+starting point, but follow the request above wherever the two differ:
+{reference}"""
         
-        response = await self._generate_with_retry(system_prompt + "\n\n" + component_prompt)
+        response = await self._generate_with_retry(
+            system_prompt + "\n\n" + component_prompt,
+            deadline=deadline,
+            label=component.value.lower(),
+            priority=priority,
+            account=account
+        )
         return self._clean_generated_code(response)
 
     def _get_main_prompt(self, prompt: str) -> str:
@@ -228,25 +414,135 @@ The configuration should include:
 - Logging configuration
 - Development/production settings"""
 
-    async def _generate_with_retry(self, prompt: str, max_retries: int = 3) -> str:
-        """Generate code with retry logic"""
+    async def _generate_with_retry(
+        self,
+        prompt: str,
+        max_retries: int = 3,
+        deadline: Optional[float] = None,
+        label: str = "code",
+        priority: Priority = Priority.INTERACTIVE,
+        account: str = DEFAULT_ACCOUNT
+    ) -> str:
+        """
+        Generate code with retry logic, giving up once the deadline passes
+
+        Retries only follow failures, so when the deadline or a disconnect
+        stops us, just the next attempt counts as an upstream call saved.
+        """
         for attempt in range(max_retries):
+            timeout = self._time_remaining(deadline)
+            if timeout is not None and timeout <= 0:
+                metrics.increment("upstream_calls_saved")
+                raise GenerationTimeoutError("Generation deadline exceeded")
+            
             try:
-                response = self.model.generate_content(prompt)
+                response = await asyncio.wait_for(
+                    self._call_model(prompt, label, priority, account),
+                    timeout=timeout
+                )
                 
                 if response.candidates and response.candidates[0].content:
                     return response.candidates[0].content.parts[0].text
                 else:
                     raise ValueError("No content generated")
                     
+            except asyncio.TimeoutError:
+                raise GenerationTimeoutError("Generation deadline exceeded")
             except Exception as e:
                 logger.warning(f"Generation attempt {attempt + 1} failed: {str(e)}")
                 if attempt == max_retries - 1:
                     raise e
-                await asyncio.sleep(1)  # Brief delay before retry
+                remaining = self._time_remaining(deadline)
+                if remaining is not None and remaining <= 1:
+                    metrics.increment("upstream_calls_saved")
+                    raise GenerationTimeoutError("Generation deadline exceeded")
+                try:
+                    await asyncio.sleep(1)  # Brief delay before retry
+                except asyncio.CancelledError:
+                    metrics.increment("upstream_calls_saved")
+                    raise
         
         raise ValueError("Failed to generate content after retries")
 
+    async def _call_model(self, prompt: str, label: str, priority: Priority, account: str):
+        """
+        Call the model once, hedging with a duplicate request if it runs slow
+        
+        The call first waits for a slot from the upstream scheduler. When
+        hedging is enabled and the primary call has not finished by the
+        configured percentile of recent latency for this label, a second call
+        is issued (within the hedge budget, and only if the scheduler has a
+        free slot) and the first success wins. Any call still in flight when
+        this returns or is cancelled is cancelled and counted as wasted.
+        """
+        issued = False
+        try:
+            async with upstream_scheduler.slot(priority, account):
+                issued = True
+                primary = asyncio.ensure_future(self.model.generate_content_async(prompt))
+                tasks = [primary]
+                # Each call is timed from its own start so a winning hedge is not charged the hedge delay
+                started = {primary: time.monotonic()}
+                hedge_slot = False
+                metrics.increment("upstream_calls")
+                
+                try:
+                    hedge_delay = None
+                    if settings.HEDGING_ENABLED:
+                        self.hedge_budget.record_call()
+                        hedge_delay = self.latency_tracker.percentile(label, settings.HEDGE_PERCENTILE)
+                    
+                    if hedge_delay is not None:
+                        await asyncio.wait(tasks, timeout=hedge_delay)
+                        if (
+                            not primary.done()
+                            and self.hedge_budget.has_capacity()
+                            and upstream_scheduler.try_acquire(priority)
+                        ):
+                            hedge_slot = True
+                            self.hedge_budget.consume()
+                            logger.debug(f"Hedging slow {label} call after {hedge_delay:.2f}s")
+                            metrics.increment("upstream_calls")
+                            metrics.increment("upstream_hedges")
+                            hedge = asyncio.ensure_future(self.model.generate_content_async(prompt))
+                            tasks.append(hedge)
+                            started[hedge] = time.monotonic()
+                    
+                    error = None
+                    pending = set(tasks)
+                    while pending:
+                        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                        for task in done:
+                            if task.exception() is None:
+                                # Only successful completions feed the latency window
+                                elapsed = time.monotonic() - started[task]
+                                self.latency_tracker.record(label, elapsed)
+                                metrics.observe(f"upstream_latency_seconds.{label}", elapsed)
+                                if task is not primary:
+                                    metrics.increment("upstream_hedges_won")
+                                return task.result()
+                            error = error or task.exception()
+                    raise error
+                finally:
+                    for task in tasks:
+                        if not task.done():
+                            task.cancel()
+                            metrics.increment("upstream_calls_wasted")
+                    if hedge_slot:
+                        upstream_scheduler.release(priority)
+        except asyncio.CancelledError:
+            # Cancelled (deadline or disconnect) while still queued for a slot
+            if not issued:
+                metrics.increment("upstream_calls_saved")
+            raise
+
+    @staticmethod
+    def _time_remaining(deadline: Optional[float]) -> Optional[float]:
+        """Seconds left until the deadline, or None when there is no deadline"""
+        if deadline is None:
+            return None
+        return deadline - time.monotonic()
+
     def _clean_generated_code(self, code: str) -> str:
         """Clean and format the generated code"""
         # Remove markdown code blocks if present
@@ -0,0 +1,90 @@
+import asyncio
+import os
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from app.core.config import settings
+from app.core.profiling import CPU, WALL, StackSampler, allocation_tracker, profile_store
+from app.core.security import verify_debug_token
+from app.core.shared_state import call_shared
+
+_profile_running = False
+
+
+def require_debug_access(x_debug_token: str = Header("")):
+    """Hide the debug surface unless profiling is enabled and the token matches."""
+    if not settings.PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not verify_debug_token(x_debug_token):
+        raise HTTPException(status_code=401, detail="Invalid debug token")
+
+
+router = APIRouter(dependencies=[Depends(require_debug_access)])
+
+
+def _render(profile, output_format: str):
+    # Profiles only cover the worker that took them; say which one
+    headers = {"X-Worker-PID": str(profile.pid)}
+    if output_format == "speedscope":
+        return JSONResponse(profile.speedscope(), headers=headers)
+    return PlainTextResponse(profile.collapsed(), headers=headers)
+
+
+@router.post("/debug/profile")
+async def run_profile(
+    seconds: float = Query(10.0, gt=0),
+    mode: str = Query(WALL, pattern=f"^({WALL}|{CPU})$"),
+    output_format: str = Query("collapsed", alias="format", pattern="^(collapsed|speedscope)$")
+):
+    """Sample all threads of the worker serving this request and return the profile."""
+    global _profile_running
+    if _profile_running:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+
+    _profile_running = True
+    sampler = StackSampler(mode=mode, interval=settings.PROFILE_SAMPLE_INTERVAL_SECONDS)
+    sampler.start()
+    try:
+        await asyncio.sleep(min(seconds, settings.PROFILE_MAX_SECONDS))
+    finally:
+        profile = sampler.stop()
+        await call_shared(profile_store, "put", profile)
+        _profile_running = False
+
+    return _render(profile, output_format)
+
+
+@router.get("/debug/profiles/{profile_id}")
+async def get_profile(
+    profile_id: str,
+    output_format: str = Query("collapsed", alias="format", pattern="^(collapsed|speedscope)$")
+):
+    """Download a stored profile from any worker, e.g. one captured with the X-Profile request header."""
+    profile = await call_shared(profile_store, "get", profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return _render(profile, output_format)
+
+
+@router.post("/debug/allocations/start")
+async def start_allocation_tracking(frames: int = Query(1, ge=1, le=50)):
+    """Start tracemalloc and take a baseline snapshot in the worker serving this request."""
+    allocation_tracker.start(frames)
+    return {"message": "Allocation tracking started", "pid": os.getpid()}
+
+
+@router.get("/debug/allocations/diff")
+async def allocation_diff(limit: int = Query(25, ge=1, le=500)):
+    """Compare current allocations against this worker's baseline snapshot."""
+    try:
+        return {"top": allocation_tracker.diff(limit), "pid": os.getpid()}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/debug/allocations/stop")
+async def stop_allocation_tracking():
+    """Stop tracemalloc and discard the baseline in the worker serving this request."""
+    allocation_tracker.stop()
+    return {"message": "Allocation tracking stopped", "pid": os.getpid()}
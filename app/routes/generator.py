@@ -1,22 +1,85 @@
 # route/genrator.py
 
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from app.models.project import ProjectPrompt, ProjectResponse
 from app.utils.generator import ProjectGenerator
 import tempfile
 import os
-from pydantic import BaseModel
-from typing import Optional, Dict, Any
-from app.generator import code_generator
+import time
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, Any, List
+from app.core.config import settings
+from app.core.scheduler import DEFAULT_ACCOUNT, Priority
+from app.core.security import decode_access_token
+from app.generator import code_generator, MicroserviceComponent, GenerationTimeoutError
+from app.utils.cancellation import cancel_on_disconnect, ClientDisconnectedError
+from app.utils.compression import StreamCompressor, negotiate_encoding
+from app.utils.results import StoredResult, is_wildcard, matching_etag, result_store
 from app.schemas.generator import (
     GenerateCodeRequest,
     GenerateCodeResponse,
     GenerateMicroserviceRequest,
-    GenerateMicroserviceResponse
+    GenerateMicroserviceResponse,
+    GenerateMicroserviceBatchRequest,
+    GenerateMicroserviceBatchItem,
+    ComponentType
 )
 router = APIRouter()
 
+def _deadline(timeout_seconds: Optional[float]) -> float:
+    """Turn a client-supplied timeout into a monotonic deadline, capped by the server"""
+    timeout = timeout_seconds or settings.GENERATION_TIMEOUT_SECONDS
+    return time.monotonic() + min(timeout, settings.GENERATION_MAX_TIMEOUT_SECONDS)
+
+def _account_key(http_request: Request) -> str:
+    """
+    Identify the caller for fair scheduling
+
+    Uses the subject of a valid bearer token, then the X-Account-ID header
+    when the request comes from a trusted proxy, then the client address.
+    Clients cannot pick their own account to claim a larger share.
+    """
+    scheme, _, token = http_request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        subject = decode_access_token(token)
+        if subject:
+            return f"user:{subject}"
+
+    host = http_request.client.host if http_request.client else None
+    if host and host in settings.TRUSTED_PROXIES:
+        account = http_request.headers.get("X-Account-ID")
+        if account:
+            return f"account:{account}"
+    return host or DEFAULT_ACCOUNT
+
+async def _result_response(http_request: Request, response: BaseModel) -> Response:
+    """Serialize a generation result once, store it for refetching and send it"""
+    result = await result_store.put(response.model_dump_json().encode())
+    return _stored_result_response(http_request, result)
+
+def _stored_result_response(http_request: Request, result: StoredResult) -> Response:
+    """Send a stored result with its ETag, compressed if the client accepts it"""
+    headers = {
+        "Vary": "Accept-Encoding",
+        "Content-Location": str(http_request.url_for("get_generation_result", result_id=result.result_id)),
+    }
+    body = result.body
+    encoding = None
+    if len(body) >= settings.COMPRESSION_MIN_SIZE:
+        encoding = negotiate_encoding(http_request.headers.get("Accept-Encoding"))
+        if encoding:
+            body = result.encoded(encoding, settings.COMPRESSION_LEVEL)
+            headers["Content-Encoding"] = encoding
+    headers["ETag"] = result.etag(encoding)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def _to_components(component_types: Optional[List[ComponentType]]) -> Optional[List[MicroserviceComponent]]:
+    """Convert schema ComponentType values to generator MicroserviceComponent values"""
+    if not component_types:
+        return None
+    return [getattr(MicroserviceComponent, comp.value.upper()) for comp in component_types]
+
 @router.post("/generate", response_model=ProjectResponse)
 async def generate_project(prompt: ProjectPrompt):
     try:
@@ -71,19 +134,35 @@ async def generate_project(prompt: ProjectPrompt):
 class CodeGenerationRequest(BaseModel):
     prompt: str
     context: Optional[Dict[str, Any]] = None
+    timeout_seconds: Optional[float] = Field(
+        None,
+        gt=0,
+        description="Give up on generation after this many seconds. Defaults to the server setting"
+    )
 
 class CodeGenerationResponse(BaseModel):
     generated_code: str
 
-@router.post("/generate", response_model=CodeGenerationResponse)
-async def generate_code(request: CodeGenerationRequest):
+# POST /generate is taken by generate_project above, so this lives under its own path
+@router.post("/generate/code", response_model=CodeGenerationResponse)
+async def generate_code(request: CodeGenerationRequest, http_request: Request):
     """Generate code using Gemini AI based on the provided prompt and context."""
     try:
-        generated_code = await code_generator.generate_code(
-            prompt=request.prompt,
-            context=request.context
+        generated_code = await cancel_on_disconnect(
+            http_request,
+            code_generator.generate_code(
+                prompt=request.prompt,
+                context=request.context,
+                deadline=_deadline(request.timeout_seconds),
+                priority=Priority.INTERACTIVE,
+                account=_account_key(http_request)
+            )
         )
-        return CodeGenerationResponse(generated_code=generated_code)
+        return await _result_response(http_request, CodeGenerationResponse(generated_code=generated_code))
+    except GenerationTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except ClientDisconnectedError as e:
+        raise HTTPException(status_code=499, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -94,26 +173,93 @@ async def generate_code(request: CodeGenerationRequest):
 
 
 @router.post("/generate/microservice", response_model=GenerateMicroserviceResponse)
-async def generate_microservice(request: GenerateMicroserviceRequest):
+async def generate_microservice(request: GenerateMicroserviceRequest, http_request: Request):
     """Generate a complete microservice or specific components based on the prompt."""
     try:
-        # Convert schema ComponentType to generator MicroserviceComponent
-        components = None
-        if request.components:
-            components = [
-                getattr(MicroserviceComponent, comp.value.upper())
-                for comp in request.components
-            ]
+        components = _to_components(request.components)
         
-        generated_code = await code_generator.generate_microservice_code(
-            prompt=request.prompt,
-            components=components
+        generated_code = await cancel_on_disconnect(
+            http_request,
+            code_generator.generate_microservice_code(
+                prompt=request.prompt,
+                components=components,
+                use_similar_cache=request.use_similar_cache,
+                deadline=_deadline(request.timeout_seconds),
+                priority=Priority.INTERACTIVE,
+                account=_account_key(http_request)
+            )
         )
-        return GenerateMicroserviceResponse(generated_code=generated_code)
+        return await _result_response(http_request, GenerateMicroserviceResponse(generated_code=generated_code))
+    except GenerationTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except ClientDisconnectedError as e:
+        raise HTTPException(status_code=499, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Microservice generation failed: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+
+@router.post("/generate/microservice/batch")
+async def generate_microservice_batch(request: GenerateMicroserviceBatchRequest, http_request: Request):
+    """Generate many microservices at once, streaming one NDJSON line per item as it completes."""
+    items = [
+        (item.prompt, _to_components(item.components), item.use_similar_cache)
+        for item in request.items
+    ]
+    deadline = _deadline(request.timeout_seconds)
+    account = _account_key(http_request)
+
+    async def stream_results():
+        async for index, generated_code, error in code_generator.generate_microservice_batch(
+            items,
+            deadline=deadline,
+            priority=Priority.BATCH,
+            account=account
+        ):
+            result = GenerateMicroserviceBatchItem(
+                index=index,
+                generated_code=generated_code,
+                error=str(error) if error else None
+            )
+            yield (result.model_dump_json() + "\n").encode()
+
+    encoding = negotiate_encoding(http_request.headers.get("Accept-Encoding"))
+    if not encoding:
+        return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+    async def compressed_results():
+        compressor = StreamCompressor(encoding, settings.COMPRESSION_LEVEL)
+        async for chunk in stream_results():
+            yield compressor.compress(chunk)
+        yield compressor.finish()
+
+    return StreamingResponse(
+        compressed_results(),
+        media_type="application/x-ndjson",
+        headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding"}
+    )
+
+
+@router.get("/generate/results/{result_id}")
+async def get_generation_result(result_id: str, http_request: Request):
+    """Fetch a previous generation result by its content hash, honouring If-None-Match."""
+    if_none_match = http_request.headers.get("If-None-Match", "")
+    # The ID is the content hash, so a matching tag needs no lookup at all
+    etag = matching_etag(if_none_match, result_id)
+    if etag:
+        return Response(status_code=304, headers={"ETag": etag, "Vary": "Accept-Encoding"})
+
+    result = await result_store.get(result_id)
+    if not result:
+        raise HTTPException(status_code=404, detail="Result not found")
+    response = _stored_result_response(http_request, result)
+    if is_wildcard(if_none_match):
+        return Response(
+            status_code=304,
+            headers={"ETag": response.headers["ETag"], "Vary": "Accept-Encoding"}
+        )
+    return response
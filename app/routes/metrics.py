@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+
+from app.core.load import load_monitor
+from app.core.shared_state import metrics_snapshot
+from app.core.scheduler import upstream_scheduler
+
+router = APIRouter()
+
+@router.get("/metrics")
+async def get_metrics():
+    """Return metrics across all workers, plus this worker's scheduler and load state."""
+    return {**(await metrics_snapshot()), "scheduler": upstream_scheduler.stats(), "load": load_monitor.stats()}
@@ -20,9 +20,36 @@ class GenerateMicroserviceRequest(BaseModel):
         None,
         description="Specific components to generate. If not provided, all components will be generated"
     )
+    use_similar_cache: bool = Field(
+        True,
+        description="Reuse components generated for the same prompt, and seed generation from a sufficiently similar one"
+    )
+    timeout_seconds: Optional[float] = Field(
+        None,
+        gt=0,
+        description="Give up on generation after this many seconds. Defaults to the server setting"
+    )
+
+class GenerateMicroserviceBatchRequest(BaseModel):
+    items: List[GenerateMicroserviceRequest] = Field(
+        ...,
+        min_length=1,
+        max_length=100,
+        description="Microservices to generate. Per-item timeout_seconds is ignored in favour of the batch timeout"
+    )
+    timeout_seconds: Optional[float] = Field(
+        None,
+        gt=0,
+        description="Give up on the whole batch after this many seconds. Defaults to the server setting"
+    )
 
 class GenerateCodeResponse(BaseModel):
     generated_code: str
 
 class GenerateMicroserviceResponse(BaseModel):
-    generated_code: Dict[str, str]
\ No newline at end of file
+    generated_code: Dict[str, str]
+
+class GenerateMicroserviceBatchItem(BaseModel):
+    index: int = Field(..., description="Position of the item in the batch request")
+    generated_code: Optional[Dict[str, str]] = None
+    error: Optional[str] = None
\ No newline at end of file
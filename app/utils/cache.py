@@ -0,0 +1,41 @@
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+
+class ByteBoundedLRU:
+    """
+    LRU cache bounded by the total size of its values rather than their count.
+
+    Callers pass each value's size in bytes; the least recently used values
+    are evicted until the total fits within max_bytes.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._items: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the value for a key, or None if it is absent or was evicted"""
+        item = self._items.get(key)
+        if item is None:
+            return None
+        self._items.move_to_end(key)
+        return item[0]
+
+    def put(self, key: Hashable, value: Any, size: int) -> None:
+        """Store a value of the given size, evicting older values as needed"""
+        previous = self._items.pop(key, None)
+        if previous is not None:
+            self.total_bytes -= previous[1]
+        if size > self.max_bytes:
+            return
+
+        self._items[key] = (value, size)
+        self.total_bytes += size
+        while self.total_bytes > self.max_bytes:
+            _, (_, evicted_size) = self._items.popitem(last=False)
+            self.total_bytes -= evicted_size
@@ -0,0 +1,39 @@
+import asyncio
+from typing import Any, Awaitable
+
+from fastapi import Request
+
+from app.core.metrics import metrics
+
+
+class ClientDisconnectedError(Exception):
+    """Raised when the client goes away before the work completes"""
+
+
+async def cancel_on_disconnect(request: Request, awaitable: Awaitable[Any], poll_interval: float = 0.5) -> Any:
+    """
+    Run an awaitable, cancelling it if the HTTP client disconnects
+
+    Args:
+        request: The incoming request whose connection is watched
+        awaitable: The work to run
+        poll_interval: Seconds between disconnect checks
+
+    Returns:
+        The result of the awaitable
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                metrics.increment("client_disconnects")
+                task.cancel()
+                # Let the task unwind so cancellation bookkeeping runs
+                await asyncio.gather(task, return_exceptions=True)
+                raise ClientDisconnectedError("Client disconnected before generation completed")
+    finally:
+        if not task.done():
+            task.cancel()
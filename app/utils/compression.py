@@ -0,0 +1,100 @@
+import zlib
+from typing import List, Optional
+
+try:
+    import brotli
+except ImportError:  # Optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # Optional dependency
+    zstandard = None
+
+GZIP = "gzip"
+BROTLI = "br"
+ZSTD = "zstd"
+
+
+def supported_encodings() -> List[str]:
+    """Encodings this process can produce, most preferred first"""
+    encodings = []
+    if zstandard is not None:
+        encodings.append(ZSTD)
+    if brotli is not None:
+        encodings.append(BROTLI)
+    encodings.append(GZIP)
+    return encodings
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Pick the best supported encoding allowed by an Accept-Encoding header
+
+    Args:
+        accept_encoding: Raw Accept-Encoding header value
+
+    Returns:
+        The chosen encoding, or None to send the body uncompressed
+    """
+    if not accept_encoding:
+        return None
+
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name.strip().lower()] = weight
+
+    best, best_weight = None, 0.0
+    for encoding in supported_encodings():
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def compress(data: bytes, encoding: str, level: int) -> bytes:
+    """Compress a complete body with the given encoding"""
+    compressor = StreamCompressor(encoding, level)
+    return compressor.compress(data) + compressor.finish()
+
+
+class StreamCompressor:
+    """
+    Incremental compressor for streamed bodies.
+
+    Each compress() call flushes its output so a streaming client can decode
+    every chunk as soon as it arrives. The level is clamped to each codec's range.
+    """
+
+    def __init__(self, encoding: str, level: int):
+        self.encoding = encoding
+        if encoding == GZIP:
+            self._compressor = zlib.compressobj(max(1, min(level, 9)), zlib.DEFLATED, 31)
+        elif encoding == BROTLI and brotli is not None:
+            self._compressor = brotli.Compressor(quality=max(0, min(level, 11)))
+        elif encoding == ZSTD and zstandard is not None:
+            self._compressor = zstandard.ZstdCompressor(level=max(1, min(level, 22))).compressobj()
+        else:
+            raise ValueError(f"Unsupported encoding: {encoding}")
+
+    def compress(self, chunk: bytes) -> bytes:
+        """Compress a chunk and flush it to a decodable boundary"""
+        if self.encoding == GZIP:
+            return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        if self.encoding == BROTLI:
+            return self._compressor.process(chunk) + self._compressor.flush()
+        return self._compressor.compress(chunk) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        """Terminate the compressed stream"""
+        if self.encoding == BROTLI:
+            return self._compressor.finish()
+        return self._compressor.flush()
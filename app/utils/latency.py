@@ -0,0 +1,64 @@
+import math
+from collections import deque
+from typing import Deque, Dict, Optional
+
+
+class LatencyTracker:
+    """
+    Online per-key latency percentiles over a sliding window of recent samples.
+
+    Keeping only the most recent samples lets the percentiles follow shifts
+    in upstream latency instead of averaging over the whole process lifetime.
+    """
+
+    def __init__(self, window_size: int = 500, min_samples: int = 20):
+        self.window_size = window_size
+        self.min_samples = min_samples
+        self._samples: Dict[str, Deque[float]] = {}
+
+    def record(self, key: str, seconds: float) -> None:
+        """Record one latency sample for a key"""
+        samples = self._samples.get(key)
+        if samples is None:
+            samples = self._samples[key] = deque(maxlen=self.window_size)
+        samples.append(seconds)
+
+    def percentile(self, key: str, percentile: float) -> Optional[float]:
+        """
+        Return the given percentile (0-100) of recent samples for a key
+
+        Returns None until at least min_samples have been recorded.
+        """
+        samples = self._samples.get(key)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        rank = max(0, math.ceil(percentile / 100 * len(ordered)) - 1)
+        return ordered[rank]
+
+
+class HedgeBudget:
+    """
+    Token bucket capping hedged requests to a fraction of upstream requests.
+
+    Each primary request earns a fraction of a token and each hedge spends
+    one. The bucket holds at most max_burst tokens, so a long quiet period
+    cannot bank an unbounded burst of hedges for the next latency spike.
+    """
+
+    def __init__(self, fraction: float, max_burst: float = 10.0):
+        self.fraction = fraction
+        self.max_burst = max_burst
+        self.tokens = 0.0
+
+    def record_call(self) -> None:
+        """Earn budget for one primary upstream request"""
+        self.tokens = min(self.max_burst, self.tokens + self.fraction)
+
+    def has_capacity(self) -> bool:
+        """Whether one more hedge stays within the budget"""
+        return self.tokens >= 1.0
+
+    def consume(self) -> None:
+        """Spend budget on one hedged request"""
+        self.tokens -= 1.0
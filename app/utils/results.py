@@ -0,0 +1,159 @@
+import hashlib
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.shared_state import call_shared, shared_or_local, shared_state_enabled
+from app.utils.compression import compress, supported_encodings
+
+
+def result_id_for(body: bytes) -> str:
+    """Content-hash ID of a serialized result"""
+    return hashlib.sha256(body).hexdigest()[:32]
+
+
+def result_etag(result_id: str, encoding: Optional[str] = None) -> str:
+    """
+    Build the ETag of a result representation
+
+    Each content encoding is a different representation with different
+    bytes, so it gets its own tag: "<id>" for identity, "<id>-<encoding>"
+    otherwise. All of them validate against the same result ID.
+    """
+    return f'"{result_id}-{encoding}"' if encoding else f'"{result_id}"'
+
+
+def parse_result_etag(etag: str) -> Tuple[str, Optional[str]]:
+    """Split an ETag built by result_etag into its result ID and encoding"""
+    result_id, _, encoding = etag.strip().removeprefix("W/").strip('"').partition("-")
+    return result_id, encoding or None
+
+
+def matching_etag(if_none_match: str, result_id: str) -> Optional[str]:
+    """
+    Match an If-None-Match header against a result's tags without a lookup
+
+    The result ID is the content hash, so any explicit tag naming it still
+    validates. "*" is not handled here: it only matches when the result
+    exists, which takes a lookup.
+
+    Returns:
+        The ETag to send with a 304, or None if no explicit tag matches
+    """
+    for tag in if_none_match.split(","):
+        tag_id, encoding = parse_result_etag(tag)
+        if tag.strip() != "*" and tag_id == result_id:
+            # Echo back the representation the client holds
+            return result_etag(result_id, encoding if encoding in supported_encodings() else None)
+    return None
+
+
+def is_wildcard(if_none_match: str) -> bool:
+    """Whether an If-None-Match header is "*", which matches any current representation"""
+    return any(tag.strip() == "*" for tag in if_none_match.split(","))
+
+
+class StoredResult:
+    """A serialized generation result and its compressed variants"""
+
+    __slots__ = ("result_id", "body", "_encoded")
+
+    def __init__(self, result_id: str, body: bytes):
+        self.result_id = result_id
+        self.body = body
+        self._encoded: Dict[str, bytes] = {}
+
+    def etag(self, encoding: Optional[str] = None) -> str:
+        """Strong ETag for the body as sent with the given content encoding"""
+        return result_etag(self.result_id, encoding)
+
+    def encoded(self, encoding: str, level: int) -> bytes:
+        """Return the body compressed with an encoding, compressing at most once"""
+        body = self._encoded.get(encoding)
+        if body is None:
+            body = self._encoded[encoding] = compress(self.body, encoding, level)
+        return body
+
+
+class ResultStore:
+    """
+    LRU store of serialized generation results keyed by content hash.
+
+    Results are serialized once; refetches reuse the stored bytes and any
+    compressed variants already produced.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._results: "OrderedDict[str, StoredResult]" = OrderedDict()
+
+    def put(self, body: bytes) -> StoredResult:
+        """Store a serialized body and return its entry"""
+        result_id = result_id_for(body)
+        result = self._results.get(result_id)
+        if result is None:
+            result = self._results[result_id] = StoredResult(result_id, body)
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+        self._results.move_to_end(result_id)
+        return result
+
+    def get(self, result_id: str) -> Optional[StoredResult]:
+        """Look up a stored result"""
+        result = self._results.get(result_id)
+        if result is not None:
+            self._results.move_to_end(result_id)
+        return result
+
+    def add(self, body: bytes) -> None:
+        """Store a serialized body without returning the entry"""
+        self.put(body)
+
+    def get_body(self, result_id: str) -> Optional[bytes]:
+        """Look up only the serialized body of a stored result"""
+        result = self.get(result_id)
+        return result.body if result is not None else None
+
+
+class TieredResultStore:
+    """
+    Worker-local ResultStore in front of the store shared by all workers.
+
+    Compressed variants live on StoredResult entries, so they must stay in
+    the worker that produced them. Only raw bodies cross to the shared
+    store: each result is sent once when stored and fetched at most once
+    per worker, after which refetches are served locally.
+    """
+
+    def __init__(self, local: ResultStore, shared: Optional[Any] = None):
+        self.local = local
+        self.shared = shared
+
+    async def put(self, body: bytes) -> StoredResult:
+        """Store a serialized body and return its entry"""
+        result = self.local.put(body)
+        if self.shared is not None:
+            await call_shared(self.shared, "add", body)
+        return result
+
+    async def get(self, result_id: str) -> Optional[StoredResult]:
+        """Look up a stored result, fetching it from the shared store on a local miss"""
+        result = self.local.get(result_id)
+        if result is None and self.shared is not None:
+            body = await call_shared(self.shared, "get_body", result_id)
+            if body is not None:
+                result = self.local.put(body)
+        return result
+
+
+def _build_result_store() -> TieredResultStore:
+    if shared_state_enabled():
+        return TieredResultStore(
+            local=ResultStore(max_entries=settings.RESULT_STORE_LOCAL_MAX_ENTRIES),
+            shared=shared_or_local("result_store", lambda: ResultStore(max_entries=settings.RESULT_STORE_MAX_ENTRIES))
+        )
+    return TieredResultStore(local=ResultStore(max_entries=settings.RESULT_STORE_MAX_ENTRIES))
+
+
+# Global instance
+result_store = _build_result_store()
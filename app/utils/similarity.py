@@ -0,0 +1,269 @@
+import re
+import hashlib
+import itertools
+import random
+from array import array
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, List, Optional, Set, Union
+
+# Words that carry no meaning for deciding whether two prompts ask for the same service
+STOPWORDS = frozenset({
+    "a", "an", "the", "and", "or", "of", "for", "to", "with", "that", "which",
+    "in", "on", "using", "use", "please", "me", "my", "i", "we", "our",
+    "create", "build", "generate", "make", "write", "implement", "develop",
+})
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def normalize_prompt(prompt: str) -> List[str]:
+    """Lowercase, tokenize and lightly stem a prompt, dropping stopwords"""
+    tokens = []
+    for token in _TOKEN_PATTERN.findall(prompt.lower()):
+        if token in STOPWORDS:
+            continue
+        # Crude plural stripping so "apis" and "api" compare equal
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def shingle(tokens: List[str], size: int = 1) -> FrozenSet[str]:
+    """Build the set of token shingles of the given size"""
+    if len(tokens) <= size:
+        return frozenset([" ".join(tokens)]) if tokens else frozenset()
+    return frozenset(" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1))
+
+
+def prompt_key(prompt: str) -> str:
+    """
+    Stable key for a prompt, equal only for prompts with the same normalized token sequence
+
+    Word order is kept: "user service that deletes orders" and "order
+    service that deletes users" share every token but ask for different code.
+    """
+    return hashlib.sha256(" ".join(normalize_prompt(prompt)).encode()).hexdigest()
+
+
+def choose_bands(num_perm: int, threshold: float, min_recall: float = 0.9) -> int:
+    """
+    Pick the LSH band count for a similarity threshold
+
+    Returns the most selective banding (fewest bands, most rows per band)
+    that still makes a pair sitting exactly at the threshold a candidate
+    with probability of at least min_recall. Fewer bands means fewer
+    dissimilar prompts land in the same bucket.
+    """
+    for bands in range(1, num_perm + 1):
+        if num_perm % bands:
+            continue
+        rows = num_perm // bands
+        if 1 - (1 - threshold ** rows) ** bands >= min_recall:
+            return bands
+    return num_perm
+
+
+@dataclass
+class PromptMatch:
+    prompt: str
+    similarity: float
+    value: Any
+    # True only when the normalized token sequences are identical; a Jaccard
+    # similarity of 1.0 can still be a reordering with a different meaning
+    exact: bool = False
+
+
+class _Entry:
+    __slots__ = ("prompt", "tokens", "shingles", "band_keys", "value")
+
+    def __init__(self, prompt: str, tokens: str, shingles: FrozenSet[str], band_keys: array, value: Any):
+        self.prompt = prompt
+        self.tokens = tokens
+        self.shingles = shingles
+        self.band_keys = band_keys
+        self.value = value
+
+
+class PromptIndex:
+    """
+    In-process near-duplicate index over normalized prompts.
+
+    Prompts are reduced to token shingles, summarised with MinHash and
+    bucketed with banded LSH tuned to the similarity threshold, so a lookup
+    only compares against stored prompts that share at least one band.
+    The candidates sharing the most bands are then ranked by exact Jaccard
+    similarity of their shingle sets, at most max_candidates per lookup.
+    Entries are keyed by their ordered normalized tokens, and only an
+    identical token sequence is reported as an exact match.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.8,
+        num_perm: int = 128,
+        bands: Optional[int] = None,
+        shingle_size: int = 1,
+        max_entries: int = 100_000,
+        max_candidates: int = 64,
+        seed: int = 1,
+    ):
+        bands = bands or choose_bands(num_perm, threshold)
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.max_entries = max_entries
+        self.max_candidates = max_candidates
+
+        rng = random.Random(seed)
+        self._perms = [
+            (rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+            for _ in range(num_perm)
+        ]
+        self._ids = itertools.count()
+        self._by_tokens: Dict[str, int] = {}
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        # Most buckets hold a single entry, stored as a bare ID to save memory
+        self._buckets: List[Dict[int, Union[int, Set[int]]]] = [{} for _ in range(bands)]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, prompt: str, value: Any) -> None:
+        """
+        Store a value under a prompt, replacing any entry with the same normalized tokens
+
+        Args:
+            prompt: The raw prompt text
+            value: The value to serve for similar prompts
+        """
+        tokens = normalize_prompt(prompt)
+        if not tokens:
+            return
+        key = " ".join(tokens)
+
+        entry_id = self._by_tokens.get(key)
+        if entry_id is not None:
+            existing = self._entries[entry_id]
+            existing.prompt = prompt
+            existing.value = value
+            self._entries.move_to_end(entry_id)
+            return
+
+        entry_id = next(self._ids)
+        shingles = shingle(tokens, self.shingle_size)
+        band_keys = self._band_keys(self._signature(shingles))
+        self._by_tokens[key] = entry_id
+        self._entries[entry_id] = _Entry(prompt, key, shingles, band_keys, value)
+        for band, key in enumerate(band_keys):
+            buckets = self._buckets[band]
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = entry_id
+            elif isinstance(bucket, int):
+                buckets[key] = {bucket, entry_id}
+            else:
+                bucket.add(entry_id)
+
+        while len(self._entries) > self.max_entries:
+            self._evict()
+
+    def lookup(self, prompt: str, threshold: float) -> Optional[PromptMatch]:
+        """
+        Find the most similar stored prompt at or above the threshold
+
+        Args:
+            prompt: The raw prompt text
+            threshold: Minimum Jaccard similarity (0.0 - 1.0) to accept; 1.0 accepts exact matches only
+
+        Returns:
+            The best match, or None if nothing is similar enough
+        """
+        tokens = normalize_prompt(prompt)
+        if not tokens:
+            return None
+
+        # Exact normalized match needs no hashing at all
+        entry_id = self._by_tokens.get(" ".join(tokens))
+        if entry_id is not None:
+            exact = self._entries[entry_id]
+            self._entries.move_to_end(entry_id)
+            return PromptMatch(prompt=exact.prompt, similarity=1.0, value=exact.value, exact=True)
+        if threshold >= 1.0:
+            return None
+        shingles = shingle(tokens, self.shingle_size)
+
+        # Entries sharing more bands are more likely to be similar; score those first
+        band_hits: Counter = Counter()
+        for band, key in enumerate(self._band_keys(self._signature(shingles))):
+            bucket = self._buckets[band].get(key)
+            if bucket is None:
+                continue
+            if isinstance(bucket, int):
+                band_hits[bucket] += 1
+            else:
+                band_hits.update(bucket)
+
+        best_id: Optional[int] = None
+        best_similarity = 0.0
+        for candidate_id, _ in band_hits.most_common(self.max_candidates):
+            candidate = self._entries[candidate_id]
+            similarity = len(shingles & candidate.shingles) / len(shingles | candidate.shingles)
+            if similarity > best_similarity:
+                best_id, best_similarity = candidate_id, similarity
+
+        if best_id is None or best_similarity < threshold:
+            return None
+
+        self._entries.move_to_end(best_id)
+        best = self._entries[best_id]
+        return PromptMatch(prompt=best.prompt, similarity=best_similarity, value=best.value)
+
+    def clear(self) -> None:
+        """Drop every stored prompt"""
+        self._by_tokens.clear()
+        self._entries.clear()
+        for bucket in self._buckets:
+            bucket.clear()
+
+    def _signature(self, shingles: FrozenSet[str]) -> List[int]:
+        """Compute the MinHash signature of a shingle set"""
+        hashes = [
+            int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "little")
+            for s in shingles
+        ]
+        return [
+            min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+            for a, b in self._perms
+        ]
+
+    def _band_keys(self, signature: List[int]) -> array:
+        """Hash each band of a signature into a compact bucket key"""
+        return array("q", (
+            hash(tuple(signature[band * self.rows:(band + 1) * self.rows]))
+            for band in range(self.bands)
+        ))
+
+    def _evict(self) -> None:
+        """Remove the least recently used entry"""
+        entry_id, entry = self._entries.popitem(last=False)
+        del self._by_tokens[entry.tokens]
+        for band, key in enumerate(entry.band_keys):
+            buckets = self._buckets[band]
+            bucket = buckets.get(key)
+            if bucket is None:
+                continue
+            if isinstance(bucket, int):
+                if bucket == entry_id:
+                    del buckets[key]
+                continue
+            bucket.discard(entry_id)
+            if len(bucket) == 1:
+                buckets[key] = bucket.pop()
@@ -0,0 +1,65 @@
+"""
+Lookup latency benchmark for the near-duplicate prompt index.
+
+Fills a PromptIndex with overlapping microservice prompts drawn from a
+narrow vocabulary (the worst case for unigram shingles) and fails if the
+average lookup exceeds the budget.
+
+    python -m benchmarks.prompt_index [entries] [budget_ms]
+"""
+import random
+import sys
+import time
+
+from app.utils.similarity import PromptIndex
+
+DOMAINS = [
+    "user", "order", "payment", "inventory", "billing", "invoice", "shipping", "catalog",
+    "product", "customer", "account", "auth", "notification", "email", "sms", "review",
+    "rating", "cart", "checkout", "subscription", "coupon", "discount", "warehouse", "supplier",
+    "employee", "payroll", "booking", "reservation", "ticket", "event", "calendar", "chat",
+    "message", "file", "document", "report", "analytics", "search", "recommendation", "blog",
+]
+KINDS = ["microservice", "service", "api", "backend", "system"]
+FEATURES = [
+    "rest", "crud", "jwt", "oauth", "postgres", "redis", "caching", "pagination", "filtering",
+    "sorting", "validation", "logging", "metrics", "docker", "kafka", "webhooks", "rate limiting",
+    "audit", "search", "export", "import", "roles", "permissions", "soft delete", "versioning",
+    "graphql", "grpc", "websocket", "scheduling", "retries", "idempotency", "uploads", "s3",
+    "emails", "reports", "tagging", "comments", "likes", "history", "management",
+]
+
+
+def make_prompt(rng: random.Random) -> str:
+    domains = " ".join(rng.sample(DOMAINS, rng.randint(1, 2)))
+    features = ", ".join(rng.sample(FEATURES, rng.randint(2, 5)))
+    return f"Create a {domains} {rng.choice(KINDS)} with {features}"
+
+
+def main(entries: int = 100_000, budget_ms: float = 1.0) -> None:
+    rng = random.Random(42)
+    index = PromptIndex(max_entries=entries)
+    for i in range(entries):
+        index.add(make_prompt(rng), i)
+
+    index.add("Create a user management microservice with REST APIs", "example")
+    match = index.lookup("build user-management REST microservice", 0.8)
+    assert match is not None and match.value == "example", match
+
+    queries = [make_prompt(rng) for _ in range(2000)]
+    start = time.perf_counter()
+    for query in queries:
+        index.lookup(query, 0.8)
+    average_ms = (time.perf_counter() - start) / len(queries) * 1000
+
+    print(f"{len(index)} entries, {index.bands}x{index.rows} bands, average lookup {average_ms:.3f} ms")
+    if average_ms > budget_ms:
+        sys.exit(f"Average lookup {average_ms:.3f} ms exceeds the {budget_ms} ms budget")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(
+        entries=int(args[0]) if len(args) > 0 else 100_000,
+        budget_ms=float(args[1]) if len(args) > 1 else 1.0
+    )
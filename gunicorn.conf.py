@@ -0,0 +1,76 @@
+# Production serving: gunicorn -c gunicorn.conf.py main:app
+import multiprocessing
+import os
+import secrets
+import shutil
+import tempfile
+
+
+def _cpu_count() -> int:
+    """CPUs available to this container, honouring CPU affinity where supported"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return multiprocessing.cpu_count()
+
+
+# Exported before settings are first loaded so every process reads the same values
+if "SHARED_STATE_SOCKET" not in os.environ:
+    # Private per-instance directory, so two deployments on one host never share a socket
+    _socket_dir = tempfile.mkdtemp(prefix="microweaver-")
+    os.environ["SHARED_STATE_SOCKET"] = os.path.join(_socket_dir, "state.sock")
+else:
+    _socket_dir = None
+os.environ.setdefault("SHARED_STATE_AUTHKEY", secrets.token_hex(16))
+
+from app.core.config import settings  # noqa: E402
+
+# One worker per CPU, but no more than the upstream quota can give a share
+# (see per_worker_limits): half the in-flight limit and the batch limit
+workers = int(os.getenv("WEB_CONCURRENCY", max(1, min(
+    _cpu_count(),
+    settings.SCHEDULER_MAX_IN_FLIGHT // 2,
+    settings.SCHEDULER_BATCH_MAX_IN_FLIGHT
+))))
+os.environ["WEB_CONCURRENCY"] = str(workers)
+settings.WEB_CONCURRENCY = workers
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+keepalive = 5
+
+# On SIGTERM workers stop accepting and get this long to finish in-flight generations
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "120"))
+timeout = int(os.getenv("WORKER_TIMEOUT", "180"))
+
+
+def on_starting(server):
+    from app.core.shared_state import SharedStateSupervisor
+
+    # Restarts the shared-state server if it dies; workers degrade to cache misses meanwhile
+    server.shared_state = SharedStateSupervisor()
+    server.shared_state.start()
+
+
+def post_fork(server, worker):
+    from app.core.database import engine
+    from app.core.shared_state import start_metrics_flusher
+
+    # Connections opened by the preloaded app must not be shared across processes
+    engine.dispose(close=False)
+    start_metrics_flusher()
+
+
+def worker_exit(server, worker):
+    from app.core.shared_state import flush_metrics
+
+    flush_metrics()
+
+
+def on_exit(server):
+    supervisor = getattr(server, "shared_state", None)
+    if supervisor is not None:
+        supervisor.stop()
+    if _socket_dir is not None:
+        shutil.rmtree(_socket_dir, ignore_errors=True)
@@ -2,7 +2,11 @@ from fastapi import FastAPI
 from app.routes.account import router as account_router  # Updated import
 from app.routes.generator import router as generator_router  # Updated import
 from app.routes.users import router as user_router  # Change user to users and user_route to user_router
+from app.routes.metrics import router as metrics_router
+from app.routes.debug import router as debug_router
 from app.core.config import settings
+from app.core.load import LoadSheddingMiddleware
+from app.core.profiling import ProfilingMiddleware
 from app.core.database import Base, engine
 
 # Create database tables
@@ -14,6 +18,14 @@ app = FastAPI(
     description=settings.PROJECT_DESCRIPTION,
     openapi_url=f"{settings.API_V1_STR}/openapi.json"
 )
+app.add_middleware(LoadSheddingMiddleware)
+if settings.PROFILING_ENABLED:
+    # Only installed when enabled so normal requests pay nothing for it
+    app.add_middleware(ProfilingMiddleware)
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
 
 
 # Include API router
@@ -21,6 +33,8 @@ app = FastAPI(
 app.include_router(account_router, prefix=settings.API_V1_STR)
 app.include_router(generator_router, prefix=settings.API_V1_STR)
 app.include_router(user_router, prefix=settings.API_V1_STR)  # Now this matches
+app.include_router(metrics_router, prefix=settings.API_V1_STR)
+app.include_router(debug_router, prefix=settings.API_V1_STR)
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
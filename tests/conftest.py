@@ -0,0 +1,4 @@
+import os
+
+# app.generator configures the Gemini client at import time
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
@@ -0,0 +1,46 @@
+import gzip
+
+import pytest
+
+from app.utils import compression
+from app.utils.compression import compress, negotiate_encoding
+
+
+@pytest.fixture
+def gzip_only(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    monkeypatch.setattr(compression, "zstandard", None)
+
+
+@pytest.fixture
+def gzip_and_brotli(monkeypatch):
+    # Only the module's presence matters for negotiation
+    monkeypatch.setattr(compression, "brotli", object())
+    monkeypatch.setattr(compression, "zstandard", None)
+
+
+@pytest.mark.parametrize("header", [None, "", "identity", "gzip;q=0", "deflate"])
+def test_no_acceptable_encoding(gzip_only, header):
+    assert negotiate_encoding(header) is None
+
+
+@pytest.mark.parametrize("header", ["gzip", "GZIP", "deflate, gzip;q=0.5", "*", "gzip;q=1.0"])
+def test_gzip_when_accepted(gzip_only, header):
+    assert negotiate_encoding(header) == "gzip"
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip, br", "br"),
+    ("br;q=0.5, gzip;q=0.8", "gzip"),
+    ("br;q=0.8, gzip;q=0.5", "br"),
+    ("br;q=0, *", "gzip"),
+    ("*;q=0.1, gzip;q=0", "br"),
+    ("br;q=invalid, gzip", "gzip"),
+])
+def test_q_values_pick_the_best_encoding(gzip_and_brotli, header, expected):
+    assert negotiate_encoding(header) == expected
+
+
+def test_gzip_round_trip():
+    data = b'{"generated_code": "print(1)"}' * 100
+    assert gzip.decompress(compress(data, "gzip", 6)) == data
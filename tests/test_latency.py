@@ -0,0 +1,45 @@
+from app.utils.latency import HedgeBudget, LatencyTracker
+
+
+def test_percentile_needs_min_samples():
+    tracker = LatencyTracker(window_size=100, min_samples=3)
+    tracker.record("main", 1.0)
+    tracker.record("main", 2.0)
+    assert tracker.percentile("main", 95) is None
+
+    tracker.record("main", 3.0)
+    assert tracker.percentile("main", 50) == 2.0
+    assert tracker.percentile("main", 95) == 3.0
+    assert tracker.percentile("routes", 95) is None
+
+
+def test_percentile_follows_the_window():
+    tracker = LatencyTracker(window_size=3, min_samples=1)
+    for seconds in (10.0, 10.0, 10.0, 1.0, 1.0, 1.0):
+        tracker.record("main", seconds)
+    assert tracker.percentile("main", 100) == 1.0
+
+
+def test_hedge_budget_earns_a_fraction_per_call():
+    budget = HedgeBudget(fraction=0.25)
+    for _ in range(3):
+        budget.record_call()
+    assert not budget.has_capacity()
+
+    budget.record_call()
+    assert budget.has_capacity()
+    budget.consume()
+    assert not budget.has_capacity()
+
+
+def test_hedge_budget_burst_is_bounded():
+    budget = HedgeBudget(fraction=0.5, max_burst=2.0)
+    # A long calm period cannot bank more than max_burst hedges
+    for _ in range(1000):
+        budget.record_call()
+
+    hedges = 0
+    while budget.has_capacity():
+        budget.consume()
+        hedges += 1
+    assert hedges == 2
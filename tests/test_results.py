@@ -0,0 +1,138 @@
+import asyncio
+import gzip
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from starlette.requests import Request
+
+from app.core.config import settings
+from app.routes.generator import get_generation_result, router
+from app.utils.results import (
+    ResultStore,
+    TieredResultStore,
+    is_wildcard,
+    matching_etag,
+    parse_result_etag,
+    result_etag,
+    result_id_for,
+    result_store,
+)
+
+RESULT_ID = "0123456789abcdef0123456789abcdef"
+
+
+def test_result_etag_round_trip():
+    assert result_etag(RESULT_ID) == f'"{RESULT_ID}"'
+    assert result_etag(RESULT_ID, "gzip") == f'"{RESULT_ID}-gzip"'
+    assert parse_result_etag(result_etag(RESULT_ID)) == (RESULT_ID, None)
+    assert parse_result_etag(result_etag(RESULT_ID, "gzip")) == (RESULT_ID, "gzip")
+    assert parse_result_etag(f' W/"{RESULT_ID}-br" ') == (RESULT_ID, "br")
+
+
+@pytest.mark.parametrize("header, expected", [
+    (f'"{RESULT_ID}"', f'"{RESULT_ID}"'),
+    (f'W/"{RESULT_ID}-gzip"', f'"{RESULT_ID}-gzip"'),
+    (f'"other", "{RESULT_ID}-gzip"', f'"{RESULT_ID}-gzip"'),
+    # Unknown encodings are never echoed back
+    (f'"{RESULT_ID}-bogus"', f'"{RESULT_ID}"'),
+    ('"other"', None),
+    ("", None),
+    # "*" needs a lookup, so it never matches without one
+    ("*", None),
+])
+def test_matching_etag(header, expected):
+    assert matching_etag(header, RESULT_ID) == expected
+
+
+def test_is_wildcard():
+    assert is_wildcard("*")
+    assert is_wildcard('"other", *')
+    assert not is_wildcard(f'"{RESULT_ID}"')
+    assert not is_wildcard("")
+
+
+def test_result_store_evicts_least_recently_used():
+    store = ResultStore(max_entries=2)
+    first = store.put(b"first")
+    second = store.put(b"second")
+    store.get(first.result_id)
+    store.put(b"third")
+
+    assert store.get(first.result_id) is first
+    assert store.get(second.result_id) is None
+    assert store.put(b"first") is first
+
+
+def test_tiered_store_keeps_encoded_variants_locally():
+    shared = ResultStore(max_entries=10)
+    store = TieredResultStore(local=ResultStore(max_entries=10), shared=shared)
+    body = b"x" * 2048
+
+    async def run():
+        stored = await store.put(body)
+        assert shared.get_body(stored.result_id) == body
+
+        # A fresh worker fetches from the shared store once and caches locally
+        other = TieredResultStore(local=ResultStore(max_entries=10), shared=shared)
+        fetched = await other.get(stored.result_id)
+        assert fetched.body == body
+        assert await other.get(stored.result_id) is fetched
+        assert await other.get("missing") is None
+
+    asyncio.run(run())
+
+
+def _request(result_id: str, headers: dict) -> Request:
+    app = FastAPI()
+    app.include_router(router)
+    return Request({
+        "type": "http",
+        "app": app,
+        "router": app.router,
+        "method": "GET",
+        "scheme": "http",
+        "server": ("testserver", 80),
+        "root_path": "",
+        "path": f"/generate/results/{result_id}",
+        "query_string": b"",
+        "headers": [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+    })
+
+
+def _get(result_id: str, **headers):
+    return asyncio.run(get_generation_result(result_id, _request(result_id, headers)))
+
+
+@pytest.fixture
+def stored():
+    body = b'{"generated_code": "' + b"x" * settings.COMPRESSION_MIN_SIZE + b'"}'
+    return asyncio.run(result_store.put(body))
+
+
+def test_get_result_sends_per_encoding_etags(stored):
+    plain = _get(stored.result_id)
+    assert plain.status_code == 200
+    assert plain.headers["ETag"] == f'"{stored.result_id}"'
+    assert plain.body == stored.body
+
+    compressed = _get(stored.result_id, **{"Accept-Encoding": "gzip"})
+    assert compressed.headers["ETag"] == f'"{stored.result_id}-gzip"'
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(compressed.body) == stored.body
+
+
+def test_matching_tag_returns_304_without_lookup():
+    result_id = result_id_for(b"never stored")
+    response = _get(result_id, **{"If-None-Match": f'"{result_id}-gzip"'})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == f'"{result_id}-gzip"'
+
+
+def test_wildcard_matches_only_stored_results(stored):
+    response = _get(stored.result_id, **{"If-None-Match": "*", "Accept-Encoding": "gzip"})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == f'"{stored.result_id}-gzip"'
+
+    with pytest.raises(HTTPException) as error:
+        _get(result_id_for(b"never stored"), **{"If-None-Match": "*"})
+    assert error.value.status_code == 404
@@ -0,0 +1,139 @@
+import asyncio
+
+import pytest
+
+from app.core.scheduler import Priority, UpstreamScheduler, per_worker_limits
+
+
+async def _settle():
+    """Let queued tasks run up to their next await"""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_interactive_is_dispatched_before_batch():
+    async def run():
+        scheduler = UpstreamScheduler(max_in_flight=1, batch_max_in_flight=1)
+        await scheduler.acquire(Priority.INTERACTIVE)
+        order = []
+
+        async def waiter(priority):
+            async with scheduler.slot(priority):
+                order.append(priority)
+
+        batch = asyncio.ensure_future(waiter(Priority.BATCH))
+        await _settle()
+        interactive = asyncio.ensure_future(waiter(Priority.INTERACTIVE))
+        await _settle()
+
+        scheduler.release(Priority.INTERACTIVE)
+        await asyncio.gather(batch, interactive)
+        return order
+
+    assert asyncio.run(run()) == [Priority.INTERACTIVE, Priority.BATCH]
+
+
+def test_batch_cannot_take_every_slot():
+    async def run():
+        scheduler = UpstreamScheduler(max_in_flight=3, batch_max_in_flight=2)
+        await scheduler.acquire(Priority.BATCH)
+        await scheduler.acquire(Priority.BATCH)
+        assert not scheduler.try_acquire(Priority.BATCH)
+
+        queued = asyncio.ensure_future(scheduler.acquire(Priority.BATCH))
+        await _settle()
+        assert not queued.done()
+
+        # The slot batch work may not use is still free for interactive calls
+        assert scheduler.try_acquire(Priority.INTERACTIVE)
+        assert scheduler.stats() == {
+            "interactive": {"in_flight": 1, "queued": 0},
+            "batch": {"in_flight": 2, "queued": 1},
+        }
+
+        scheduler.release(Priority.BATCH)
+        await asyncio.wait_for(queued, timeout=1)
+        assert scheduler.stats()["batch"]["in_flight"] == 2
+
+    asyncio.run(run())
+
+
+def test_cancellation_after_grant_hands_slot_on():
+    async def run():
+        scheduler = UpstreamScheduler(max_in_flight=1, batch_max_in_flight=1)
+        await scheduler.acquire(Priority.INTERACTIVE)
+        first = asyncio.ensure_future(scheduler.acquire(Priority.INTERACTIVE))
+        second = asyncio.ensure_future(scheduler.acquire(Priority.INTERACTIVE))
+        await _settle()
+
+        # Grant the slot to the first waiter, then cancel it before it resumes
+        scheduler.release(Priority.INTERACTIVE)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+        await asyncio.wait_for(second, timeout=1)
+        assert scheduler.stats()["interactive"] == {"in_flight": 1, "queued": 0}
+
+    asyncio.run(run())
+
+
+def test_cancellation_while_queued_keeps_capacity():
+    async def run():
+        scheduler = UpstreamScheduler(max_in_flight=1, batch_max_in_flight=1)
+        await scheduler.acquire(Priority.INTERACTIVE)
+        waiter = asyncio.ensure_future(scheduler.acquire(Priority.BATCH))
+        await _settle()
+
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        scheduler.release(Priority.INTERACTIVE)
+
+        assert scheduler.stats()["batch"] == {"in_flight": 0, "queued": 0}
+        assert scheduler.try_acquire(Priority.BATCH)
+
+    asyncio.run(run())
+
+
+def test_account_weights_share_capacity():
+    async def run():
+        scheduler = UpstreamScheduler(max_in_flight=1, batch_max_in_flight=1, account_weights={"heavy": 3.0})
+        await scheduler.acquire(Priority.INTERACTIVE)
+        order = []
+
+        async def waiter(account):
+            async with scheduler.slot(Priority.INTERACTIVE, account):
+                order.append(account)
+
+        tasks = []
+        for _ in range(4):
+            for account in ("heavy", "light"):
+                tasks.append(asyncio.ensure_future(waiter(account)))
+                await _settle()
+
+        scheduler.release(Priority.INTERACTIVE)
+        await asyncio.gather(*tasks)
+        return order
+
+    order = asyncio.run(run())
+    assert order[:4].count("heavy") == 3
+    assert sorted(order) == ["heavy"] * 4 + ["light"] * 4
+
+
+def test_account_weights_must_be_positive():
+    with pytest.raises(ValueError):
+        UpstreamScheduler(max_in_flight=1, batch_max_in_flight=1, account_weights={"a": 0.0})
+
+
+def test_per_worker_limits():
+    # A single worker keeps the configured limits, even a quota of one
+    assert per_worker_limits(1, 1, 1) == (1, 1)
+    assert per_worker_limits(16, 12, 1) == (16, 12)
+    # Several workers split the quota and always keep an interactive-only slot
+    assert per_worker_limits(16, 12, 4) == (4, 3)
+    assert per_worker_limits(16, 12, 8) == (2, 1)
+    with pytest.raises(ValueError):
+        per_worker_limits(16, 12, 9)
+    with pytest.raises(ValueError):
+        per_worker_limits(16, 2, 3)
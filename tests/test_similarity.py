@@ -0,0 +1,48 @@
+from app.utils.similarity import PromptIndex, choose_bands, prompt_key
+
+
+def test_prompt_key_ignores_filler_but_keeps_word_order():
+    assert prompt_key("Create a user service that deletes orders") == prompt_key("user service deletes orders")
+    assert prompt_key("user service that deletes orders") != prompt_key("order service that deletes users")
+
+
+def test_choose_bands_meets_recall_at_threshold():
+    bands = choose_bands(128, 0.8, min_recall=0.9)
+    rows = 128 // bands
+    assert 1 - (1 - 0.8 ** rows) ** bands >= 0.9
+    assert (bands, rows) == (16, 8)
+
+
+def test_exact_match_requires_same_token_order():
+    index = PromptIndex(threshold=0.8)
+    index.add("user service that deletes orders", "orders-key")
+
+    exact = index.lookup("Create a user service that deletes orders", 1.0)
+    assert exact.exact and exact.value == "orders-key"
+
+    # Same words in another order: never exact, and invisible at threshold 1.0
+    assert index.lookup("order service that deletes users", 1.0) is None
+    reordered = index.lookup("order service that deletes users", 0.8)
+    assert reordered is not None and not reordered.exact
+
+
+def test_similar_prompt_matches_below_one():
+    index = PromptIndex(threshold=0.8)
+    prompt = "order service with REST API, PostgreSQL database, JWT auth and rate limiting"
+    index.add(prompt, "postgres-key")
+
+    match = index.lookup(prompt.replace("PostgreSQL", "MongoDB"), 0.8)
+    assert match is not None and not match.exact and 0.8 <= match.similarity < 1.0
+    assert index.lookup("billing invoice api with stripe webhooks", 0.8) is None
+
+
+def test_index_evicts_least_recently_used():
+    index = PromptIndex(max_entries=2)
+    index.add("inventory service with stock levels", "a")
+    index.add("payment service with stripe checkout", "b")
+    index.lookup("inventory service with stock levels", 1.0)
+    index.add("notification service with email templates", "c")
+
+    assert len(index) == 2
+    assert index.lookup("payment service with stripe checkout", 1.0) is None
+    assert index.lookup("inventory service with stock levels", 1.0).value == "a"